@@ -1,7 +1,83 @@
-from nlp_utils import remove_symbols, DefaultVocabularySet, BasicStringTokenizer, LetterCaseOptimizer
-import pandas, sys, os 
+from nlp_utils import download_corpora, remove_symbols, DefaultVocabularySet, BasicStringTokenizer, LetterCaseOptimizer, Pipeline
+from processing_manifest import ProcessingManifest, files_stat_digest
+from pipeline_metrics import ProgressReporter
+from corpus_io import iterate_csv_column, iterate_csv_sources, list_csv_sources, source_output_name
+import multiprocessing, collections, pandas, pickle, heapq, sys, os 
 from typing import * 
 
+class SpaceSavingCounter:
+
+    # Space-Saving heavy hitters: at most "capacity" tokens are monitored, and every estimated count 
+    # overshoots the true count by no more than its recorded error (itself at most total / capacity); 
+    # "floor" bounds the true count of any token that is not monitored (0 until something was evicted)
+    def __init__(self, capacity : int) -> None:
+        assert (capacity > 0)
+        self.capacity = capacity 
+        self.counts = dict()
+        self.errors = dict()
+        self.min_heap = []
+        self.floor = 0
+        self.total = 0
+
+    def add(self, token : str, occurrence : Optional[ int ] = 1) -> None:
+        self.total += occurrence 
+        if (token in self.counts):
+            self.counts[token] += occurrence 
+            return 
+        if (len(self.counts) < self.capacity):
+            self.counts[token] = self.floor + occurrence;  self.errors[token] = self.floor 
+            heapq.heappush(self.min_heap, (self.counts[token], token))
+            return 
+        # heap entries may lag behind their counts; refresh stale ones until the true minimum surfaces 
+        while True:
+            min_count, min_token = heapq.heappop(self.min_heap)
+            if (self.counts[min_token] == min_count):
+                break 
+            heapq.heappush(self.min_heap, (self.counts[min_token], min_token))
+        del self.counts[min_token];  del self.errors[min_token]
+        self.floor = max(self.floor, min_count)
+        self.counts[token] = min_count + occurrence;  self.errors[token] = min_count 
+        heapq.heappush(self.min_heap, (self.counts[token], token))
+
+    def update(self, tokens : Union[ Iterable[ str ], Dict[ str, int ] ]) -> None:
+        if (isinstance(tokens, dict)):
+            for token, occurrence in tokens.items():
+                self.add(token, occurrence)
+            return 
+        for token in tokens:
+            self.add(token)
+
+    def items(self) -> Iterator[ Tuple[ str, int ] ]:
+        return iter(self.counts.items())
+
+    def summary(self) -> Dict[ str, Any ]:
+        # plain (picklable) state for "merge" 
+        return {  "counts" : dict(self.counts), "errors" : dict(self.errors), "floor" : self.floor, "total" : self.total  }
+
+    def merge(self, summary : Dict[ str, Any ]) -> None:
+        # mergeable summaries: a token missing on one side counts that side's "floor" (as count and as error), 
+        # the "capacity" largest estimates are kept and the largest dropped estimate raises the floor 
+        other_counts, other_errors, other_floor = summary["counts"], summary["errors"], summary["floor"]
+        counts = dict();  errors = dict()
+        for token in set(self.counts).union(other_counts):
+            counts[token] = self.counts.get(token, self.floor) + other_counts.get(token, other_floor)
+            errors[token] = self.errors.get(token, self.floor) + other_errors.get(token, other_floor)
+        floor = self.floor + other_floor 
+        ranked_tokens = sorted(counts, key = lambda token : (-counts[token], token))
+        for token in ranked_tokens[ self.capacity : ]:
+            floor = max(floor, counts.pop(token));  del errors[token]
+        self.counts, self.errors, self.floor = counts, errors, floor 
+        self.min_heap = [  (count, token) for token, count in counts.items()  ]
+        heapq.heapify(self.min_heap)
+        self.total += summary["total"]
+
+    def heavy_hitters(self, min_threshold : int, guaranteed : Optional[ bool ] = False) -> Dict[ str, int ]:
+        # "guaranteed" keeps only tokens whose lower bound (count - error) reaches the threshold 
+        return {
+            token : occurrence for token, occurrence in self.counts.items() 
+                if ((occurrence - self.errors[token] * guaranteed) >= min_threshold)
+        }
+
 class TokensOccurrenceAnalyzer:
 
     @staticmethod 
@@ -20,24 +96,40 @@ class TokensOccurrenceAnalyzer:
         keys, values = zip(*token_occurrences)
         pandas.DataFrame({  "token" : keys, "occurrences" : values  }).to_csv(filename, *args, **kwargs)
 
-    def __init__(self, pattern : str) -> None:
+    def __init__(self, pattern : str, vocabulary_snapshot : Optional[ str ] = None, approximate_capacity : Optional[ int ] = None) -> None:
         DVS = DefaultVocabularySet
-        DVS.initialize()
+        DVS.initialize(vocabulary_snapshot)
+        self.pattern = pattern
+        self.vocabulary_snapshot = vocabulary_snapshot
+        self.approximate_capacity = approximate_capacity
         self.tokenizer = BasicStringTokenizer(pattern)
-        self.optimizer = LetterCaseOptimizer(DVS.stopwords.union(DVS.wordnet, DVS.words, DVS.names))
-        self.dictionary = dict()
+        # compiled once next to the snapshot and loaded by every later analyzer (pool worker)
+        self.optimizer = LetterCaseOptimizer.load_or_compile(
+            ((os.path.splitext(vocabulary_snapshot)[0] + ".analyzer.case_optimizer") if (vocabulary_snapshot is not None) else (None)),
+            ((files_stat_digest([ vocabulary_snapshot ])) if (vocabulary_snapshot is not None) else ("")),
+            lambda : DVS.stopwords.union(DVS.wordnet, DVS.words, DVS.names)
+        )
+        self.pipeline = Pipeline([
+            self.tokenizer, remove_symbols, lambda tokens : self.optimizer.optimize(tokens, return_unknown = True)[1]
+        ])
+        self.dictionary = collections.Counter() if (approximate_capacity is None) else SpaceSavingCounter(approximate_capacity)
         self.dataframe_counter = 1
 
+    def unknown_tokens(self, text : str) -> List[ str ]:
+        return self.pipeline(text)
+
+    @staticmethod 
+    def prune_occurrences(token_occurrences : Dict[ str, int ], min_threshold : int) -> None:
+        for token, occurrence in list(token_occurrences.items()):
+            if (occurrence < min_threshold):
+                del token_occurrences[token]
+
     def analyze(self, dataframe : pandas.DataFrame, column_name : str, verbose : Optional[ bool ] = True) -> None:
-        num_rows = len(dataframe)
-        for row_idx, row_data in dataframe.iterrows():
-            if (verbose):
-                sys.stdout.write("\rAnalyzing #{0}: {1:.1f}%".format(self.dataframe_counter, row_idx / num_rows * 100))
-                sys.stdout.flush()
-            self.analyze_token_occurrences(self.optimizer.optimize(remove_symbols(self.tokenizer.tokenize(str(row_data[column_name]))), return_unknown = True)[1], self.dictionary)
-        if (verbose):
-            sys.stdout.write("\rAnalyzing #{0}: 100.0%".format(self.dataframe_counter))
-            print("")
+        progress = ProgressReporter("Analyzing #{0}".format(self.dataframe_counter), len(dataframe), verbose = verbose)
+        for text in dataframe[column_name].tolist():
+            self.dictionary.update(self.unknown_tokens(str(text)))
+            progress.update()
+        progress.finish()
         self.dataframe_counter += 1
         
     def analyze_from_folder(self, folder_name     : str, 
@@ -47,15 +139,69 @@ class TokensOccurrenceAnalyzer:
                                   error_bad_lines : Optional[ bool ] = False   ) -> None:
         if (verbose):
             print("Analyzing Folder: {0}\n".format(folder_name))
-        for idx, dataframe_filename in enumerate( os.path.join(folder_name, filename) for filename in os.listdir(folder_name) if (filename[-4:].lower() == ".csv") ):
-            self.analyze(pandas.read_csv(dataframe_filename, encoding = encoding, error_bad_lines = error_bad_lines), column_name, verbose)
+        for dataframe_filename, dataframe in iterate_csv_sources(list_csv_sources(folder_name, sort = False), encoding = encoding, error_bad_lines = error_bad_lines):
+            self.analyze(dataframe, column_name, verbose)
         if (verbose):
             print("\nAnalysis Complete.")
 
+    def analyze_from_folder_parallel(self, folder_name     : str, 
+                                           column_name     : str, 
+                                           num_workers     : Optional[ int  ] = None,
+                                           prune_threshold : Optional[ int  ] = 1,
+                                           max_tokens      : Optional[ int  ] = None,
+                                           verbose         : Optional[ bool ] = True,
+                                           encoding        : Optional[ str  ] = "utf-8",
+                                           error_bad_lines : Optional[ bool ] = False,
+                                           manifest        : Optional[ ProcessingManifest ] = None,
+                                           cache_folder    : Optional[ str  ] = None   ) -> None:
+        # with a manifest, per-file counters are cached in "cache_folder" and only new or changed files are counted 
+        if (verbose):
+            print("Analyzing Folder: {0}\n".format(folder_name))
+        dataframe_filenames = list_csv_sources(folder_name)
+        manifest_parameters = {
+            "stage" : "analyze_new_words", "pattern" : self.pattern, "column_name" : column_name, "prune_threshold" : prune_threshold, "max_tokens" : max_tokens,
+            "approximate_capacity" : self.approximate_capacity, "cache_format" : (("counts") if (self.approximate_capacity is None) else ("space_saving_summary")),
+            "vocabulary_snapshot" : ((files_stat_digest([ self.vocabulary_snapshot ])) if (self.vocabulary_snapshot is not None) else (None))
+        }
+        if (manifest is not None):
+            assert (cache_folder is not None)
+            os.makedirs(cache_folder, exist_ok = True)
+            pending_filenames = manifest.pending(dataframe_filenames, manifest_parameters)
+            for dataframe_filename in sorted(set(dataframe_filenames).difference(pending_filenames)):
+                with open(manifest.output(dataframe_filename), "rb") as rf:
+                    self.merge_occurrences(pickle.load(rf))
+            if (verbose):
+                print("Reused {0} Counted File(s).".format(len(dataframe_filenames) - len(pending_filenames)))
+            dataframe_filenames = pending_filenames 
+        shard_arguments = [  (dataframe_filename, column_name, prune_threshold, max_tokens, self.approximate_capacity, encoding, error_bad_lines) for dataframe_filename in dataframe_filenames  ]
+        # merged in file order, so the approximate counts do not depend on which worker finishes first 
+        with multiprocessing.Pool(num_workers, initializer = initialize_worker, initargs = (self.pattern, self.vocabulary_snapshot)) as pool:
+            for idx, (dataframe_filename, token_occurrences) in enumerate(pool.imap(count_shard_occurrences, shard_arguments), start = 1):
+                self.merge_occurrences(token_occurrences)
+                if (manifest is not None):
+                    cache_filename = os.path.join(cache_folder, source_output_name(dataframe_filename) + ".counts.pickle")
+                    with open(cache_filename, "wb") as wf:
+                        pickle.dump(token_occurrences, wf, protocol = pickle.HIGHEST_PROTOCOL)
+                    manifest.record(dataframe_filename, manifest_parameters, cache_filename)
+                if (verbose):
+                    sys.stdout.write("\rAnalyzing: {0} / {1} files".format(idx, len(shard_arguments)))
+                    sys.stdout.flush()
+        self.dataframe_counter += len(shard_arguments)
+        if (verbose):
+            print("\n\nAnalysis Complete.")
+
+    def merge_occurrences(self, token_occurrences : Dict[ str, Any ]) -> None:
+        # a shard's result: exact counts, or a "SpaceSavingCounter.summary" with "approximate_capacity"
+        if (isinstance(self.dictionary, SpaceSavingCounter)):
+            self.dictionary.merge(token_occurrences)
+            return 
+        self.dictionary.update(token_occurrences)
+
     def filter(self, min_threshold : int) -> None:
-        for token, occurrence in list(self.dictionary.items()):
-            if (occurrence < min_threshold):
-                del self.dictionary[token]
+        if (isinstance(self.dictionary, SpaceSavingCounter)):
+            self.dictionary = self.dictionary.heavy_hitters(min_threshold)
+            return 
+        self.prune_occurrences(self.dictionary, min_threshold)
 
     def save(self, filename :           str, 
                    sort     : Optional[ bool ] = True, 
@@ -71,12 +217,38 @@ class TokensOccurrenceAnalyzer:
             for row_idx, row_data in dataframe.iterrows():
                 wf.write(f"{row_data['token']}\n")
 
+# analyzer owned by the current (worker) process, built once by "initialize_worker"
+_worker_analyzer = None
+
+def initialize_worker(pattern : str, vocabulary_snapshot : Optional[ str ] = None) -> None:
+    global _worker_analyzer
+    _worker_analyzer = TokensOccurrenceAnalyzer(pattern, vocabulary_snapshot)
+
+def count_shard_occurrences(shard_arguments : Tuple[ str, str, int, Optional[ int ], Optional[ int ], str, bool ]) -> Tuple[ str, Dict[ str, Any ] ]:
+    # with "approximate_capacity" the shard returns (and caches) a Space-Saving summary of at most that many tokens, errors included, 
+    # for "SpaceSavingCounter.merge"; otherwise rare tokens are pruned whenever the counter outgrows "max_tokens" and once more at the end of the shard 
+    dataframe_filename, column_name, prune_threshold, max_tokens, approximate_capacity, encoding, error_bad_lines = shard_arguments
+    if (approximate_capacity is not None):
+        token_occurrences = SpaceSavingCounter(approximate_capacity)
+        for texts in iterate_csv_column(dataframe_filename, column_name, encoding, error_bad_lines):
+            for unknown_tokens in _worker_analyzer.pipeline.run(texts):
+                token_occurrences.update(unknown_tokens)
+        return (dataframe_filename, token_occurrences.summary())
+    token_occurrences = collections.Counter()
+    for texts in iterate_csv_column(dataframe_filename, column_name, encoding, error_bad_lines):
+        for unknown_tokens in _worker_analyzer.pipeline.run(texts):
+            token_occurrences.update(unknown_tokens)
+        if (max_tokens is not None) and (len(token_occurrences) > max_tokens):
+            TokensOccurrenceAnalyzer.prune_occurrences(token_occurrences, prune_threshold)
+    TokensOccurrenceAnalyzer.prune_occurrences(token_occurrences, prune_threshold)
+    return (dataframe_filename, token_occurrences)
+
 if (__name__ == "__main__"):
 
 
     # >> PARAMETERS 
 
-    training_data_folder = os.path.join(os.path.dirname(__file__), "news") # reviews / news
+    training_data_folder = os.path.join(os.path.dirname(__file__), "news") # reviews / news (folder or ".zip" / ".tar.gz" archive)
 
     custom_dict_folder   = os.path.join(os.path.dirname(__file__), "dictionary")
 
@@ -85,20 +257,33 @@ if (__name__ == "__main__"):
 
     custom_dict_filename     = os.path.join(custom_dict_folder, "custom_words_neut.txt") # custom_words_sent.txt / custom_words_neut.txt
 
+    vocabulary_snapshot      = os.path.join(custom_dict_folder, "default_vocabulary.snapshot")
+
     token_regular_expression = "[a-zA-Z0-9\']+"
     
     dataframe_column_name    = "content"
 
     thresh_occurrence        = 30
 
+    num_workers              = os.cpu_count() or 1
+
+    approximate_capacity     = None # e.g. 1000000 : bounded-memory heavy hitters 
+
     # << PARAMETERS 
 
 
+    download_corpora()
+
     occurrence_dataframe_filename = os.path.splitext(custom_dict_filename)[0] + ".csv" 
 
-    tokens_occurrences_analyzer   = TokensOccurrenceAnalyzer(token_regular_expression)
+    tokens_occurrences_analyzer   = TokensOccurrenceAnalyzer(token_regular_expression, vocabulary_snapshot, approximate_capacity)
+
+    occurrences_cache_folder      = os.path.join(custom_dict_folder, "occurrences_cache", os.path.basename(training_data_folder))
 
-    tokens_occurrences_analyzer.analyze_from_folder(training_data_folder, dataframe_column_name)
+    tokens_occurrences_analyzer.analyze_from_folder_parallel(
+        training_data_folder, dataframe_column_name, num_workers,
+        manifest = ProcessingManifest(os.path.join(occurrences_cache_folder, "manifest.json")), cache_folder = occurrences_cache_folder
+    )
 
     tokens_occurrences_analyzer.filter(thresh_occurrence)
 
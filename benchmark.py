@@ -0,0 +1,136 @@
+from nlp_utils import download_corpora, remove_symbols, CustomWordSet, StopWordRemover, DefaultVocabularySet, BasicStringTokenizer, LetterCaseOptimizer, TokensTaggingLemmatizer
+from word_embed import DF2PKL
+from gensim.models import Word2Vec
+import resource, tempfile, random, pandas, json, time, sys, os
+from typing import *
+
+SYNTHETIC_WORDS = [
+    "game", "play", "players", "story", "graphics", "great", "bad", "fun", "boring", "update", "developers", "server",
+    "the", "a", "is", "was", "not", "very", "really", "but", "and", "this", "that", "with", "for", "of", "to",
+    "government", "report", "city", "market", "officials", "said", "year", "people", "women", "children", "police",
+    "don't", "it's", "can't", "I'm", "they're", "wasn't", "Steam", "NASA", "Paris", "lol", "gg", "10/10", "!!!", ":)"
+]
+
+def generate_synthetic_paragraph(random_generator : random.Random, min_words : int, max_words : int) -> str:
+    return " ".join(random_generator.choice(SYNTHETIC_WORDS) for _ in range(random_generator.randint(min_words, max_words)))
+
+def generate_synthetic_dataframes(folder_name : str, num_files : int, num_rows : int, seed : Optional[ int ] = 0) -> List[ str ]:
+    # "result_<even>.csv" are positive reviews, "result_<odd>.csv" negative ones, "news_<n>.csv" neutral articles
+    random_generator = random.Random(seed)
+    filenames = []
+    for file_idx in range(num_files):
+        is_review = (file_idx % 3 != 2)
+        filename = os.path.join(folder_name, ((f"result_{file_idx}.csv") if (is_review) else (f"news_{file_idx}.csv")))
+        pandas.DataFrame({
+            "voting"  : [  (("Recommended") if (file_idx % 2 == 0) else ("Not Recommended")) for _ in range(num_rows)  ],
+            "content" : [  generate_synthetic_paragraph(random_generator, *((5, 120) if (is_review) else (150, 400))) for _ in range(num_rows)  ]
+        }).to_csv(filename, encoding = "utf-8", index = False)
+        filenames.append(filename)
+    return filenames
+
+def peak_rss_megabytes() -> float:
+    # "ru_maxrss" is reported in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / ((1 << 20) if (sys.platform == "darwin") else (1 << 10))
+
+def time_stage(stage_name : str, stage_function : Callable[ [ Any ], Any ], stage_input : Any, num_documents : int, results : Dict[ str, Dict[ str, float ] ]) -> Any:
+    # the peak RSS is a process-lifetime maximum: a stage is only charged for how far it raised it
+    start_peak_rss = peak_rss_megabytes()
+    start_time = time.perf_counter()
+    stage_output = stage_function(stage_input)
+    elapsed_seconds = time.perf_counter() - start_time
+    num_tokens = sum(len(tokens) for tokens in stage_output) if (isinstance(stage_output, list)) else (0)
+    results[stage_name] = {
+        "seconds"                     : elapsed_seconds,
+        "documents_per_second"        : num_documents / max(elapsed_seconds, 1e-9),
+        "tokens_per_second"           : num_tokens / max(elapsed_seconds, 1e-9),
+        "output_tokens"               : num_tokens,
+        "process_peak_rss_megabytes"  : peak_rss_megabytes(),
+        "peak_rss_increase_megabytes" : peak_rss_megabytes() - start_peak_rss
+    }
+    return stage_output
+
+def run_benchmark(num_files          : Optional[ int ] = 6,
+                  num_rows           : Optional[ int ] = 1000,
+                  stopword_filename  : Optional[ str ] = os.path.join(os.path.dirname(__file__), "dictionary/custom_stopwords.txt"),
+                  vector_size        : Optional[ int ] = 100,
+                  num_epochs         : Optional[ int ] = 1,
+                  num_workers        : Optional[ int ] = 4,
+                  seed               : Optional[ int ] = 0 ) -> Dict[ str, Any ]:
+
+    DefaultVocabularySet.initialize()
+    tokenizer = BasicStringTokenizer("[a-zA-Z0-9\']+")
+    case_optimizer = LetterCaseOptimizer(DefaultVocabularySet.stopwords.union(
+        DefaultVocabularySet.wordnet, DefaultVocabularySet.words, DefaultVocabularySet.names
+    ))
+    lemmatizer = TokensTaggingLemmatizer()
+    stopword_filter = StopWordRemover(CustomWordSet(stopword_filename))
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as folder_name:
+        raw_folder = os.path.join(folder_name, "raw");  tokenized_folder = os.path.join(folder_name, "tokenized")
+        os.makedirs(raw_folder);  os.makedirs(tokenized_folder)
+        filenames = generate_synthetic_dataframes(raw_folder, num_files, num_rows, seed)
+        texts = [  str(text) for filename in filenames for text in pandas.read_csv(filename, encoding = "utf-8")["content"].tolist()  ]
+        num_documents = len(texts)
+
+        list_of_tokens = time_stage("tokenize",          lambda texts : [  tokenizer.tokenize(text) for text in texts  ],                  texts,          num_documents, results)
+        list_of_tokens = time_stage("remove_symbols",    lambda batch : [  remove_symbols(tokens) for tokens in batch  ],                  list_of_tokens, num_documents, results)
+        list_of_tokens = time_stage("optimize",          lambda batch : [  case_optimizer.optimize(tokens) for tokens in batch  ],          list_of_tokens, num_documents, results)
+        list_of_tokens = time_stage("lemmatize",         lambda batch : [  lemmatizer.lemmatize(list(tokens)) for tokens in batch  ],      list_of_tokens, num_documents, results)
+        list_of_tokens = time_stage("remove_stopwords",  lambda batch : [  stopword_filter.remove(tokens) for tokens in batch  ],         list_of_tokens, num_documents, results)
+
+        for file_idx, filename in enumerate(filenames):
+            pandas.DataFrame({  "content" : [  str(tokens) for tokens in list_of_tokens[ file_idx * num_rows : (file_idx + 1) * num_rows ]  ]  }).to_csv(
+                os.path.join(tokenized_folder, os.path.basename(filename)), encoding = "utf-8", index = False
+            )
+
+        training_data = time_stage("df2pkl_load", lambda folder_list : DF2PKL.load_dataframe_tokens_from_folders(folder_list, "content", verbose = False), [ tokenized_folder ], num_documents, results)
+
+        def train_word2vec(training_data : List[ List[ str ] ]) -> List[ List[ str ] ]:
+            Word2Vec(training_data, vector_size = vector_size, workers = num_workers, epochs = num_epochs, seed = seed)
+            return training_data 
+
+        time_stage("word2vec_training", train_word2vec, training_data, num_documents, results)
+
+    return {
+        "configuration" : {  "num_files" : num_files, "num_rows" : num_rows, "vector_size" : vector_size, "num_epochs" : num_epochs, "num_workers" : num_workers, "seed" : seed  },
+        "stages" : results,
+        "process_peak_rss_megabytes" : peak_rss_megabytes()
+    }
+
+if (__name__ == "__main__"):
+
+
+    # >> PARAMETERS
+
+    num_files   = 6
+
+    num_rows    = 1000
+
+    vector_size = 100
+
+    num_epochs  = 1
+
+    num_workers = 4
+
+    result_folder = os.path.join(os.path.dirname(__file__), "benchmark_results")
+
+    # << PARAMETERS
+
+
+    download_corpora(quiet = True)
+
+    benchmark_result = run_benchmark(num_files, num_rows, vector_size = vector_size, num_epochs = num_epochs, num_workers = num_workers)
+
+    if not (os.path.exists(result_folder)):
+        os.makedirs(result_folder)
+
+    result_filename = os.path.join(result_folder, time.strftime("benchmark_%Y%m%d_%H%M%S.json"))
+
+    with open(result_filename, "w", encoding = "utf-8") as wf:
+        json.dump(benchmark_result, wf, indent = 2)
+
+    print(json.dumps(benchmark_result, indent = 2))
+
+    print(f"\nSaved Benchmark Result: \"{result_filename}\"")
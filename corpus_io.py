@@ -0,0 +1,171 @@
+import contextlib, zipfile, tarfile, pandas, ast, os
+from typing import *
+
+try:
+    import pyarrow.parquet
+except (ImportError):
+    pyarrow = None 
+
+# archive members are addressed as "<archive path>::<member name>"
+ARCHIVE_SEPARATOR = "::"
+
+# tokenized corpora: "str(tokens)" in CSV, or a native list column in Parquet 
+TOKEN_FILE_EXTENSIONS = (".csv", ".parquet")
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+def is_zip_archive(path : str) -> bool:
+    return path.lower().endswith(".zip")
+
+def is_tar_archive(path : str) -> bool:
+    return path.lower().endswith(TAR_SUFFIXES)
+
+def strip_archive_suffix(path : str) -> str:
+    for suffix in (".zip", ) + TAR_SUFFIXES:
+        if (path.lower().endswith(suffix)):
+            return path[ : -len(suffix) ]
+    return path 
+
+def split_source(source : str) -> Tuple[ str, Union[ str, None ] ]:
+    container, separator, member = source.partition(ARCHIVE_SEPARATOR)
+    return ((container, member) if (separator) else (container, None))
+
+def source_output_name(source : str) -> str:
+    # flat file name for outputs derived from "source"; archive members keep their directories (joined by "__") so equal base names do not collide
+    container, member = split_source(source)
+    if (member is None):
+        return os.path.basename(container)
+    return "__".join(part for part in member.replace("\\", "/").split("/") if (part not in ("", ".")))
+
+def list_csv_sources(path : str, sort : Optional[ bool ] = True, file_extension : Optional[ Union[ str, Tuple[ str, ... ] ] ] = ".csv") -> List[ str ]:
+    # a folder lists its own files; an archive lists its file members (macOS resource forks excluded)
+    file_extensions = ((file_extension, ) if (isinstance(file_extension, str)) else (file_extension))
+    def is_csv(filename : str) -> bool:
+        return ((os.path.splitext(filename)[1].lower() in file_extensions) and not (filename.startswith("__MACOSX/")))
+    if (is_zip_archive(path)):
+        with zipfile.ZipFile(path) as archive:
+            sources = [  path + ARCHIVE_SEPARATOR + info.filename for info in archive.infolist() if (not info.is_dir()) and (is_csv(info.filename))  ]
+    elif (is_tar_archive(path)):
+        with tarfile.open(path) as archive:
+            sources = [  path + ARCHIVE_SEPARATOR + info.name for info in archive.getmembers() if (info.isfile()) and (is_csv(info.name))  ]
+    else:
+        sources = [
+            os.path.join(path, filename) for filename in os.listdir(path) 
+                if (is_csv(filename)) and (os.path.isfile(os.path.join(path, filename)))
+        ]
+    return ((sorted(sources)) if (sort) else (sources))
+
+def list_token_sources(path : str, sort : Optional[ bool ] = True, output_format : Optional[ str ] = None) -> List[ str ]:
+    # tokenized corpora of one format; without "output_format" a file present as both ".csv" and ".parquet" would be read twice
+    if (output_format is not None):
+        return list_csv_sources(path, sort, "." + output_format)
+    sources = list_csv_sources(path, sort, TOKEN_FILE_EXTENSIONS)
+    stems = set()
+    for source in sources:
+        stem = os.path.splitext(source)[0]
+        if (stem in stems):
+            raise ValueError(f"\"{stem}\" exists in more than one token file format, pick one with \"output_format\"")
+        stems.add(stem)
+    return sources
+
+@contextlib.contextmanager
+def open_source(source : str) -> Iterator[ IO[ bytes ] ]:
+    container, member = split_source(source)
+    if (member is None):
+        with open(container, "rb") as rf:
+            yield rf 
+    elif (is_zip_archive(container)):
+        with zipfile.ZipFile(container) as archive, archive.open(member) as rf:
+            yield rf 
+    else:
+        with tarfile.open(container) as archive:
+            yield archive.extractfile(member)
+
+def iterate_sources(sources : Iterable[ str ]) -> Iterator[ Tuple[ str, IO[ bytes ] ] ]:
+    # opens every container once; tar members come in archive order, so a compressed tar is decompressed in a single forward pass 
+    # instead of being rescanned for every member; each file object is only readable until the next one is yielded
+    containers = dict()
+    for source in sources:
+        container, member = split_source(source)
+        containers.setdefault(container, []).append(member)
+    for container, members in containers.items():
+        if (members[0] is None):
+            with open(container, "rb") as rf:
+                yield (container, rf)
+        elif (is_zip_archive(container)):
+            with zipfile.ZipFile(container) as archive:
+                for member in members:
+                    with archive.open(member) as rf:
+                        yield (container + ARCHIVE_SEPARATOR + member, rf)
+        else:
+            remaining = set(members)
+            with tarfile.open(container) as archive:
+                for info in archive:
+                    if (info.name in remaining):
+                        remaining.discard(info.name)
+                        yield (container + ARCHIVE_SEPARATOR + info.name, archive.extractfile(info))
+            if (remaining):
+                raise KeyError(f"\"{sorted(remaining)[0]}\" not found in \"{container}\"")
+
+def read_csv_source(source : str, *args, **kwargs) -> pandas.DataFrame:
+    with open_source(source) as rf:
+        return pandas.read_csv(rf, *args, **kwargs)
+
+def iterate_csv_sources(sources : Iterable[ str ], *args, **kwargs) -> Iterator[ Tuple[ str, pandas.DataFrame ] ]:
+    # "read_csv_source" over many sources, in the order of "iterate_sources"
+    for source, rf in iterate_sources(sources):
+        yield (source, pandas.read_csv(rf, *args, **kwargs))
+
+def parse_token_list(text : str) -> List[ str ]:
+    # fast path for "str(List[ str ])" of symbol-free tokens: "['a', 'b']"
+    if (text == "[]"):
+        return []
+    if (text[:2] == "['") and (text[-2:] == "']") and ("\\" not in text) and ("\"" not in text):
+        return text[ 2 : -2 ].split("', '")
+    return ast.literal_eval(text)
+
+def iterate_csv_column(filename        : str, 
+                       column_name     : str, 
+                       encoding        : Optional[ str  ] = "utf-8", 
+                       error_bad_lines : Optional[ bool ] = False, 
+                       chunk_size      : Optional[ int  ] = 10000    ) -> Iterator[ List[ str ] ]:
+    with open_source(filename) as rf:
+        for chunk in pandas.read_csv(rf, encoding = encoding, error_bad_lines = error_bad_lines, usecols = [ column_name ], chunksize = chunk_size):
+            yield [  str(value) for value in chunk[column_name].tolist()  ]
+
+def iterate_csv_token_lists(filename        : str, 
+                            column_name     : str, 
+                            encoding        : Optional[ str  ] = "utf-8", 
+                            error_bad_lines : Optional[ bool ] = False, 
+                            chunk_size      : Optional[ int  ] = 10000    ) -> Iterator[ List[ List[ str ] ] ]:
+    for chunk in iterate_csv_column(filename, column_name, encoding, error_bad_lines, chunk_size):
+        yield [  parse_token_list(text) for text in chunk  ]
+
+def require_pyarrow() -> None:
+    if (pyarrow is None):
+        raise ImportError("Parquet support requires \"pyarrow\" (pip install pyarrow)")
+
+def is_parquet_source(source : str) -> bool:
+    return source.lower().endswith(".parquet")
+
+def write_parquet_tokens(filename : str, dataframe : pandas.DataFrame) -> None:
+    # token columns hold "List[ str ]" values and are stored as Arrow list<string>
+    require_pyarrow()
+    dataframe.to_parquet(filename, engine = "pyarrow", index = False)
+
+def iterate_parquet_token_lists(filename    : str, 
+                                column_name : str, 
+                                chunk_size  : Optional[ int ] = 10000) -> Iterator[ List[ List[ str ] ] ]:
+    require_pyarrow()
+    with open_source(filename) as rf:
+        for record_batch in pyarrow.parquet.ParquetFile(rf).iter_batches(batch_size = chunk_size, columns = [ column_name ]):
+            yield record_batch.column(0).to_pylist()
+
+def iterate_token_lists(filename        : str, 
+                        column_name     : str, 
+                        encoding        : Optional[ str  ] = "utf-8", 
+                        error_bad_lines : Optional[ bool ] = False, 
+                        chunk_size      : Optional[ int  ] = 10000    ) -> Iterator[ List[ List[ str ] ] ]:
+    if (is_parquet_source(filename)):
+        return iterate_parquet_token_lists(filename, column_name, chunk_size)
+    return iterate_csv_token_lists(filename, column_name, encoding, error_bad_lines, chunk_size)
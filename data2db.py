@@ -1,39 +1,73 @@
+from pipeline_metrics import ProgressReporter
+from corpus_io import iterate_token_lists, list_csv_sources, list_token_sources, read_csv_source
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.collection import Collection
 from pymongo import MongoClient
-import pandas, ast, sys, re, os 
+import pandas, time, ast, sys, re, os 
 from typing import *
 
 def csvs_in_folder(folder_name : str, sort : Optional[ bool ] = True) -> List[ str ]:
-    files_in_folder = [
-        os.path.join(folder_name, filename) for filename in os.listdir(folder_name) 
-            if ((os.path.splitext(filename)[1].lower() == ".csv") and (os.path.dirname(filename) == ""))
-    ]
-    return ((sorted(files_in_folder)) if (sort) else (files_in_folder))
+    return list_csv_sources(folder_name, sort)
 
 def even_filename_label(filename : str) -> bool:
     return (int(re.findall("[0-9]+$", os.path.splitext(os.path.basename(filename))[0])[0]) % 2 == 0)
 
 def insert_dataframe_to_database(dataframe : pandas.DataFrame, verbose : Optional[ bool ] = True, file_percentage : Optional[ float ] = 100.0) -> None:
     global collection, DATAFRAME_COLUMN_NAME
-    num_rows = len(dataframe)
-    for row_idx, row_data in dataframe.iterrows():
-        if (verbose):
-            sys.stdout.write("\r[ Inserting ] [ {0:.1f}% ] [ {1:.1f}% ]".format(file_percentage, row_idx / num_rows * 100) + "  ")
-            sys.stdout.flush()
+    progress = ProgressReporter("[ Inserting ] [ {0:.1f}% ] [ Rows ]".format(file_percentage), len(dataframe), verbose = verbose)
+    for text in dataframe[DATAFRAME_COLUMN_NAME].tolist():
         collection.insert_one(document = {
-            "content" : ast.literal_eval(str(row_data[DATAFRAME_COLUMN_NAME]))
+            "content" : ast.literal_eval(str(text))
         })
+        progress.update()
     if (verbose):
-        sys.stdout.write("\r[ Inserting ] [ {0:.1f}% ] [ 100.0% ]".format(file_percentage) + "  ")
+        sys.stdout.write("\r[ Inserting ] [ {0:.1f}% ] [ Rows ]: 100.0%".format(file_percentage) + "  ")
         sys.stdout.flush()
 
 def insert_dataframes_to_database(dataframe_files : List[ str ], verbose : Optional[ bool ] = True) -> None:
     num_dataframes = len(dataframe_files)
     for file_label, filename in enumerate(dataframe_files, start = 1):
-        dataframe = pandas.read_csv(filename, encoding = "utf-8")
+        dataframe = read_csv_source(filename, encoding = "utf-8")
         insert_dataframe_to_database(dataframe, verbose, file_label / num_dataframes * 100)
     if (verbose):
         print("\n\n< Insertion Complete >")
 
+def bulk_insert_dataframe_file(collection  : Collection, 
+                               filename    : str, 
+                               column_name : Optional[ str ] = "content", 
+                               batch_size  : Optional[ int ] = 1000, 
+                               encoding    : Optional[ str ] = "utf-8"    ) -> int:
+    num_documents = 0
+    for token_lists in iterate_token_lists(filename, column_name, encoding, chunk_size = batch_size):
+        if (len(token_lists)):
+            collection.insert_many([  {  "content" : tokens  } for tokens in token_lists  ], ordered = False)
+            num_documents += len(token_lists)
+    return num_documents 
+
+def bulk_insert_dataframe_files(collection      : Collection, 
+                                dataframe_files : List[ str ], 
+                                column_name     : Optional[ str  ] = "content", 
+                                batch_size      : Optional[ int  ] = 1000, 
+                                num_workers     : Optional[ int  ] = 4, 
+                                verbose         : Optional[ bool ] = True       ) -> Dict[ str, float ]:
+    num_documents = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = num_workers) as executor:
+        file_documents = executor.map(lambda filename : bulk_insert_dataframe_file(collection, filename, column_name, batch_size), dataframe_files)
+        for file_label, num_file_documents in enumerate(file_documents, start = 1):
+            num_documents += num_file_documents 
+            if (verbose):
+                sys.stdout.write("\r[ Inserting ] [ {0:.1f}% ] [ {1:,.0f} docs/s ]".format(file_label / len(dataframe_files) * 100, num_documents / max(time.perf_counter() - start_time, 1e-9)) + "  ")
+                sys.stdout.flush()
+    elapsed_seconds = time.perf_counter() - start_time 
+    if (verbose):
+        print("\n\n< Insertion Complete >")
+    return {
+        "documents"            : num_documents, 
+        "seconds"              : elapsed_seconds, 
+        "documents_per_second" : num_documents / max(elapsed_seconds, 1e-9)
+    }
+
 if (__name__ == "__main__"):
 
     # >> CONSTANTS 
@@ -68,8 +102,19 @@ if (__name__ == "__main__"):
 
     INSERTION_MODE = INSERTION_NEG
 
+    BULK_INSERTION = True 
+
+    BULK_BATCH_SIZE = 1000
+
+    BULK_NUM_WORKERS = 4
+
+    DATAFRAME_FORMAT = None # csv / parquet (None : either, a file tokenized in both formats is rejected)
+
     # << PARAMETERS
 
+    # Parquet token files are only understood by the bulk path 
+    DATAFRAME_FORMAT = ((DATAFRAME_FORMAT) if (BULK_INSERTION) else ("csv"))
+
     client = MongoClient(DATABASE_URI)
 
     database = client[DATABASE_NAME]
@@ -78,11 +123,11 @@ if (__name__ == "__main__"):
 
         collection = database[COLLECTION_NEU]
 
-        csvs = csvs_in_folder(DATAFRAME_FOLDER_NEU)
+        csvs = list_token_sources(DATAFRAME_FOLDER_NEU, output_format = DATAFRAME_FORMAT)
     
     else:
 
-        csvs = csvs_in_folder(DATAFRAME_FOLDER_SEN)
+        csvs = list_token_sources(DATAFRAME_FOLDER_SEN, output_format = DATAFRAME_FORMAT)
 
         if (INSERTION_MODE == INSERTION_POS):
 
@@ -96,5 +141,11 @@ if (__name__ == "__main__"):
 
             csvs = list(filter(lambda x : not even_filename_label(x), csvs))
 
-    insert_dataframes_to_database(csvs)
+    if (BULK_INSERTION):
+
+        bulk_insert_dataframe_files(collection, csvs, DATAFRAME_COLUMN_NAME, BULK_BATCH_SIZE, BULK_NUM_WORKERS)
+
+    else:
+
+        insert_dataframes_to_database(csvs)
 
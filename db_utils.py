@@ -1,6 +1,61 @@
+from pipeline_metrics import ProgressReporter
 from pymongo import MongoClient, UpdateOne 
 from typing import *
-import numpy, sys
+import threading, random, numpy, queue, sys
+
+def prefetch(iterable : Iterable[ Any ], num_prefetch : Optional[ int ] = 2) -> Iterator[ Any ]:
+    # background thread keeps the next "num_prefetch" items ready while the consumer works 
+    items = queue.Queue(maxsize = max(num_prefetch, 1))
+    end_of_items = object()
+    stop_event = threading.Event()
+
+    def put(entry : Tuple[ Any, Union[ Exception, None ] ]) -> bool:
+        # gives up once the consumer has stopped, so an abandoned generator never blocks the producer 
+        while not (stop_event.is_set()):
+            try:
+                items.put(entry, timeout = 0.1)
+                return True 
+            except (queue.Full):
+                continue 
+        return False 
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not (put((item, None))):
+                    return 
+            put((end_of_items, None))
+        except (Exception) as exception:
+            put((end_of_items, exception))
+
+    thread = threading.Thread(target = produce, daemon = True)
+    thread.start()
+    try:
+        while True:
+            item, exception = items.get()
+            if (exception is not None):
+                raise exception 
+            if (item is end_of_items):
+                break 
+            yield item 
+    finally:
+        stop_event.set()
+        thread.join()
+
+def to_padded_ids(batch        : List[ List[ str ] ], 
+                  token_index  : Dict[ str, int ], 
+                  max_length   : Optional[ int ] = None, 
+                  pad_id       : Optional[ int ] = 0, 
+                  unknown_id   : Optional[ int ] = None) -> numpy.ndarray:
+    # unknown tokens are dropped unless "unknown_id" is given 
+    batch_ids = [
+        [  token_index.get(token, unknown_id) for token in tokens if ((unknown_id is not None) or (token in token_index))  ][ : max_length ]
+            for tokens in batch 
+    ]
+    padded_ids = numpy.full((len(batch_ids), max((len(token_ids) for token_ids in batch_ids), default = 0)), pad_id, dtype = numpy.int32)
+    for row_idx, token_ids in enumerate(batch_ids):
+        padded_ids[ row_idx, : len(token_ids) ] = token_ids 
+    return padded_ids 
 
 class SentimentAnalysisDatabase(MongoClient):
 
@@ -52,10 +107,9 @@ class SentimentAnalysisDatabase(MongoClient):
             num_documents = current_collection.count_documents({})
             random_tag = numpy.random.choice([ self.DATA_TESTING, self.DATA_TRAINING ], size = num_documents, p = [ test_ratio, 1 - test_ratio ])
             bulk_updates = []
+            progress = ProgressReporter("[ Splitting ] [ {0:.1f}% ] [ Documents ]".format((collection_idx + 1) / (self.SENTIMENT_NEG + 1) * 100), num_documents, verbose = verbose)
             for document_idx, document in enumerate(current_collection.find({})):
-                if (verbose):
-                    sys.stdout.write("\r[ Splitting ] [ {0:.1f}% ] [ {1:.1f}% ]".format((collection_idx + 1) / (self.SENTIMENT_NEG + 1) * 100, (document_idx + 1) / num_documents * 100) + "  ")
-                    sys.stdout.flush()
+                progress.update()
                 bulk_updates.append(UpdateOne(
                     filter = {  "_id"  : document["_id"]                            },
                     update = {  "$set" : { "tag" : int(random_tag[document_idx]) }  }
@@ -65,10 +119,96 @@ class SentimentAnalysisDatabase(MongoClient):
         if (verbose):
             print("\n\n< Splitting Complete >")
 
+    def hash_train_test_split(self, test_ratio : float, seed : Optional[ int ] = 0, resolution : Optional[ int ] = 1000000, verbose : Optional[ bool ] = True) -> None:
+        # tags are assigned inside MongoDB (>= 7.0 for "$toHashedIndexKey") from a seeded hash of "_id";
+        # the same seed and ratio always reproduce the same split, so no unset pass is needed 
+        assert (0 <= test_ratio <= 1)
+        seeded_hash = {  "$toHashedIndexKey" : {  "$concat" : [ {  "$toString" : "$_id"  }, f":{seed}" ]  }  }
+        hash_bucket = {  "$abs" : {  "$mod" : [ seeded_hash, resolution ]  }  }
+        for collection_idx in range(self.SENTIMENT_NEU, self.SENTIMENT_NEG + 1):
+            if (verbose):
+                sys.stdout.write("\r[ Splitting ] [ {0:.1f}% ]".format(collection_idx / (self.SENTIMENT_NEG + 1) * 100) + "  ")
+                sys.stdout.flush()
+            current_collection = self.database_collections[collection_idx]
+            current_collection.update_many({}, [
+                {  "$set" : {  "tag" : {  "$cond" : [ {  "$lt" : [ hash_bucket, test_ratio * resolution ]  }, self.DATA_TESTING, self.DATA_TRAINING ]  }  }  }
+            ])
+            current_collection.create_index("tag")
+        if (verbose):
+            print("\r[ Splitting ] [ 100.0% ]\n\n< Splitting Complete >")
+
     def generate_data(self, sentiment : int, tag : int) -> Iterator[ List[ str ] ]:
         for document in self.database_collections[sentiment].find(filter = {  "tag" : tag  }):
             yield document["content"] 
 
+    def generate_batches(self, sentiment    : int, 
+                               tag          : int, 
+                               batch_size   : Optional[ int ] = 256, 
+                               num_prefetch : Optional[ int ] = 4, 
+                               token_index  : Optional[ Dict[ str, int ] ] = None, 
+                               max_length   : Optional[ int ] = None, 
+                               pad_id       : Optional[ int ] = 0           ) -> Iterator[ Union[ List[ List[ str ] ], numpy.ndarray ] ]:
+
+        def generate_minibatches() -> Iterator[ Union[ List[ List[ str ] ], numpy.ndarray ] ]:
+            cursor = self.database_collections[sentiment].find(
+                filter = {  "tag" : tag  }, projection = {  "_id" : False, "content" : True  }, batch_size = batch_size 
+            )
+            batch = []
+            for document in cursor:
+                batch.append(document["content"])
+                if (len(batch) == batch_size):
+                    yield ((batch) if (token_index is None) else (to_padded_ids(batch, token_index, max_length, pad_id)))
+                    batch = []
+            if (len(batch)):
+                yield ((batch) if (token_index is None) else (to_padded_ids(batch, token_index, max_length, pad_id)))
+
+        return prefetch(generate_minibatches(), num_prefetch)
+
+    def page_documents(self, sentiment : int, tag : int, page_size : Optional[ int ] = 1000) -> Iterator[ List[ str ] ]:
+        # keyset pagination over the ("tag", "_id") index instead of "skip"
+        current_collection = self.database_collections[sentiment]
+        current_collection.create_index([ ("tag", 1), ("_id", 1) ])
+        last_id = None 
+        while True:
+            id_filter = {  "tag" : tag  } if (last_id is None) else {  "tag" : tag, "_id" : {  "$gt" : last_id  }  }
+            page = list(current_collection.find(filter = id_filter, projection = {  "content" : True  }).sort("_id", 1).limit(page_size))
+            for document in page:
+                yield document["content"]
+            if (len(page) < page_size):
+                return 
+            last_id = page[-1]["_id"]
+
+    def sample_balanced(self, tag           : int, 
+                              class_weights : Optional[ List[ float ] ] = None, 
+                              buffer_size   : Optional[ int ] = 10000, 
+                              page_size     : Optional[ int ] = 1000, 
+                              seed          : Optional[ int ] = 0, 
+                              exhaust_all   : Optional[ bool ] = False ) -> Iterator[ Tuple[ List[ str ], int ] ]:
+        # yields (content, sentiment) drawn across collections at "class_weights", shuffled within a bounded buffer 
+        # sampling stops once any weighted collection runs out; "exhaust_all" keeps drawing from the rest (the mix then drifts off the weights)
+        sentiments = list(range(self.SENTIMENT_NEU, self.SENTIMENT_NEG + 1))
+        class_weights = list((class_weights) if (class_weights is not None) else ([ 1.0 ] * len(sentiments)))
+        assert (len(class_weights) == len(sentiments))
+        random_generator = random.Random(seed)
+        streams = {  sentiment : self.page_documents(sentiment, tag, page_size) for sentiment in sentiments if (class_weights[sentiment] > 0)  }
+        shuffle_buffer = []
+        while (len(streams)):
+            sentiment = random_generator.choices(list(streams), weights = [  class_weights[sentiment] for sentiment in streams  ])[0]
+            document = next(streams[sentiment], None)
+            if (document is None):
+                if not (exhaust_all):
+                    break 
+                del streams[sentiment]
+                continue 
+            if (len(shuffle_buffer) < buffer_size):
+                shuffle_buffer.append((document, sentiment))
+                continue 
+            sample_idx = random_generator.randrange(buffer_size)
+            yield shuffle_buffer[sample_idx]
+            shuffle_buffer[sample_idx] = (document, sentiment)
+        random_generator.shuffle(shuffle_buffer)
+        yield from shuffle_buffer 
+
     def num_documents(self, sentiment : int, tag : int) -> int:
         return self.database_collections[sentiment].count_documents({  "tag" : tag  })
 
@@ -78,7 +218,7 @@ if (__name__ == "__main__"):
     database = SentimentAnalysisDatabase("mongodb://localhost:27017")
 
     # spliting data into training and testing set 
-    database.train_test_split(0.10)
+    database.hash_train_test_split(0.10, seed = 0)
 
     print("")
 
@@ -92,4 +232,9 @@ if (__name__ == "__main__"):
     # testing data generator 
     for document in database.generate_data(database.SENTIMENT_POS, database.DATA_TRAINING):
         print(document)
+        break 
+
+    # testing batched data generator 
+    for batch in database.generate_batches(database.SENTIMENT_POS, database.DATA_TRAINING, batch_size = 32):
+        print(len(batch))
         break 
\ No newline at end of file
@@ -1,10 +1,99 @@
-import contractions, nltk, re
+from pipeline_metrics import metrics 
+import collections.abc, contractions, itertools, functools, pickle, struct, array, mmap, nltk, re, os
 from typing import *
 
+SYMBOL_FREE_TOKEN = re.compile("[a-zA-Z0-9]+")
+
 class classproperty(property):
     def __get__(self, owner_self, owner_cls):
         return self.fget(owner_cls)
 
+def download_corpora(quiet : Optional[ bool ] = False) -> None:
+    for resource in ("stopwords", "wordnet", "names", "words", "averaged_perceptron_tagger"):
+        nltk.download(resource, quiet = quiet)
+
+class SortedStringTable(collections.abc.Set):
+
+    def __init__(self, buffer : memoryview, offset : int, count : int) -> None:
+        offsets_end = offset + 8 * (count + 1)
+        self._count = count
+        self._offsets = buffer[ offset : offsets_end ].cast("Q")
+        self._data = buffer[ offsets_end : offsets_end + self._offsets[count] ]
+
+    @staticmethod 
+    def encode(strings : Iterable[ str ]) -> bytes:
+        # [ uint64 offsets (count + 1) ][ "\n"-terminated UTF-8 strings sorted bytewise ]
+        encoded_strings = sorted(set(string.encode("utf-8") for string in strings))
+        offsets = array.array("Q", [ 0 ])
+        for encoded_string in encoded_strings:
+            offsets.append(offsets[-1] + len(encoded_string) + 1)
+        return offsets.tobytes() + b"".join(encoded_string + b"\n" for encoded_string in encoded_strings)
+
+    def _item(self, idx : int) -> bytes:
+        return bytes(self._data[ self._offsets[idx] : self._offsets[idx + 1] - 1 ])
+
+    def __len__(self) -> int:
+        return self._count 
+
+    def __iter__(self) -> Iterator[ str ]:
+        return iter(str(self._data, "utf-8").split("\n")[ : self._count ])
+
+    def __contains__(self, string : object) -> bool:
+        if not isinstance(string, str):
+            return False 
+        key = string.encode("utf-8")
+        lower_bound, upper_bound = 0, self._count
+        while (lower_bound < upper_bound):
+            middle = (lower_bound + upper_bound) // 2
+            if (self._item(middle) < key):
+                lower_bound = middle + 1
+            else:
+                upper_bound = middle 
+        return ((lower_bound < self._count) and (self._item(lower_bound) == key))
+
+    @classmethod 
+    def _from_iterable(class_, iterable : Iterable[ str ]) -> Set[ str ]:
+        return set(iterable)
+
+    def union(self, *others : Iterable[ str ]) -> Set[ str ]:
+        return set(self).union(*others)
+
+class VocabularySnapshot:
+
+    MAGIC = b"DVSNAP"
+
+    VERSION = 1
+
+    HEADER = struct.Struct("<6sHI")
+
+    SECTION = struct.Struct("<QQ")
+
+    @classmethod 
+    def dump(class_, filename : str, word_sets : List[ Iterable[ str ] ]) -> None:
+        sections = [  SortedStringTable.encode(word_set) for word_set in word_sets  ]
+        section_offset = class_.HEADER.size + class_.SECTION.size * len(sections)
+        section_headers = []
+        for word_set, section in zip(word_sets, sections):
+            section_headers.append(class_.SECTION.pack(section_offset, len(set(word_set))))
+            section_offset += len(section) + (-len(section) % 8)
+        with open(filename, "wb") as wf:
+            wf.write(class_.HEADER.pack(class_.MAGIC, class_.VERSION, len(sections)))
+            wf.write(b"".join(section_headers))
+            for section in sections:
+                wf.write(section + b"\0" * (-len(section) % 8))
+
+    @classmethod 
+    def load(class_, filename : str) -> List[ SortedStringTable ]:
+        with open(filename, "rb") as rf:
+            buffer = memoryview(mmap.mmap(rf.fileno(), 0, access = mmap.ACCESS_READ))
+        magic, version, num_sections = class_.HEADER.unpack_from(buffer, 0)
+        if (magic != class_.MAGIC) or (version != class_.VERSION):
+            raise ValueError(f"Incompatible vocabulary snapshot: \"{filename}\"")
+        return [
+            SortedStringTable(buffer, *class_.SECTION.unpack_from(buffer, class_.HEADER.size + class_.SECTION.size * section_idx))
+                for section_idx in range(num_sections)
+        ]
+
 class DefaultVocabularySet:
 
     __corpus_word_sets = [
@@ -12,72 +101,143 @@ class DefaultVocabularySet:
     ]
 
     @classmethod 
-    def initialize(class_) -> bool:
+    def initialize(class_, snapshot_filename : Optional[ str ] = None, download : Optional[ bool ] = False) -> bool:
         if all(  (wordset is not None) for wordset in class_.__corpus_word_sets  ):
             return False 
-        nltk.download("stopwords")
-        nltk.download("wordnet")
-        nltk.download("names")
-        nltk.download("words")
+        if (snapshot_filename is not None) and (os.path.exists(snapshot_filename)):
+            class_.__corpus_word_sets = VocabularySnapshot.load(snapshot_filename)
+            return True 
+        if (download):
+            download_corpora()
         class_.__corpus_word_sets = [
             set(nltk.corpus.stopwords.words()),
             set(nltk.corpus.wordnet.words()),
             set(nltk.corpus.names.words()),
             set(nltk.corpus.words.words())
         ]
+        if (snapshot_filename is not None):
+            VocabularySnapshot.dump(snapshot_filename, class_.__corpus_word_sets)
         return True 
 
     @classproperty
-    def stopwords(class_) -> Union[ Set[ str ], None ]:
+    def stopwords(class_) -> Union[ AbstractSet[ str ], None ]:
         return class_.__corpus_word_sets[0]
 
     @classproperty
-    def wordnet(class_) -> Union[ Set[ str ], None ]:
+    def wordnet(class_) -> Union[ AbstractSet[ str ], None ]:
         return class_.__corpus_word_sets[1]
 
     @classproperty
-    def names(class_) -> Union[ Set[ str ], None ]:
+    def names(class_) -> Union[ AbstractSet[ str ], None ]:
         return class_.__corpus_word_sets[2]
 
     @classproperty
-    def words(class_) -> Union[ Set[ str ], None ]:
+    def words(class_) -> Union[ AbstractSet[ str ], None ]:
         return class_.__corpus_word_sets[3]
   
 class LetterCaseOptimizer:
 
-    def __init__(self, token_dictionary : Set[ str ]) -> None:
+    def __init__(self, token_dictionary : Set[ str ], case_index : Optional[ Dict[ str, str ] ] = None) -> None:
         self.token_dictionary = set( 
             token for token in token_dictionary 
         )
+        self.case_index = (
+            (self.compile_case_index(self.token_dictionary)) if (case_index is None) else (case_index)
+        )
 
     @staticmethod 
     def enumerate_letter_cases(text : str) -> Iterator[ str ]:
         yield text;  yield text.upper();  yield text.capitalize();  yield text.lower()
 
+    @classmethod 
+    def compile_case_index(class_, token_dictionary : Set[ str ]) -> Dict[ str, str ]:
+        # lowercased key => first of (UPPER, Capitalized, lower) found in dictionary ("" if only other casings exist)
+        case_index = dict()
+        for token in token_dictionary:
+            key = token.lower()
+            if (key in case_index):
+                continue 
+            for cased_token in itertools.islice(class_.enumerate_letter_cases(key), 1, None):
+                if (cased_token in token_dictionary):
+                    case_index[key] = cased_token 
+                    break 
+            else:
+                case_index[key] = ""
+        return case_index 
+
+    def save(self, filename : str, source_key : Optional[ str ] = None) -> None:
+        # write-then-rename, since several workers may compile the same optimizer at once 
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary_filename, "wb") as wf:
+            pickle.dump((source_key, self.token_dictionary, self.case_index), wf, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_filename, filename)
+
+    @classmethod 
+    def load(class_, filename : str, source_key : Optional[ str ] = None) -> "LetterCaseOptimizer":
+        with open(filename, "rb") as rf:
+            saved_optimizer = pickle.load(rf)
+        # optimizers saved without a source key: ( token_dictionary, case_index )
+        saved_key, token_dictionary, case_index = (((None, ) + saved_optimizer) if (len(saved_optimizer) == 2) else (saved_optimizer))
+        if (source_key is not None) and (saved_key != source_key):
+            raise ValueError(f"Stale letter case optimizer: \"{filename}\"")
+        return class_(token_dictionary, case_index)
+
+    @classmethod 
+    def load_or_compile(class_, filename : Union[ str, None ], source_key : str, build_dictionary : Callable[ [], Set[ str ] ]) -> "LetterCaseOptimizer":
+        # "source_key" identifies what "build_dictionary" reads (e.g. a digest of the snapshot and custom dictionaries); 
+        # the dictionary is only built (and the vocabulary tables only decoded) when no current compiled optimizer exists 
+        if (filename is not None) and (os.path.exists(filename)):
+            try:
+                return class_.load(filename, source_key)
+            except (ValueError, EOFError, pickle.UnpicklingError):
+                pass 
+        optimizer = class_(build_dictionary())
+        if (filename is not None):
+            optimizer.save(filename, source_key)
+        return optimizer 
+
     def optimize(self, tokens         : List[ str ], 
                        make_copy      : Optional[ bool ] = False, 
                        return_unknown : Optional[ bool ] = False,
                        filter_unknown : Optional[ bool ] = False) -> Union[ List[ str ], Tuple[ List[ str ], List[ str ] ] ]:
         if (make_copy):
             tokens = [  token for token in tokens  ]
+        token_dictionary = self.token_dictionary;  case_index = self.case_index
         unknown_tokens = [];  known_tokens = []
-        for idx, token in enumerate(tokens):
-            for token in self.enumerate_letter_cases(token):
-                if (token in self.token_dictionary):
-                    known_tokens.append(token)
-                    break 
-            else:
-                unknown_tokens.append(token)
-            tokens[idx] = token
+        with metrics.stage("case_lookup"):
+            for idx, token in enumerate(tokens):
+                key = token.lower()
+                cased_token = case_index.get(key)
+                if (cased_token is not None) and (cased_token != token) and (token in token_dictionary):
+                    cased_token = token 
+                if not (cased_token):
+                    unknown_tokens.append(key)
+                    tokens[idx] = key 
+                    continue 
+                known_tokens.append(cased_token)
+                tokens[idx] = cased_token 
+        metrics.count_tokens("case_lookup", len(tokens))
         if (filter_unknown):
             tokens = known_tokens
         return ((tokens, unknown_tokens) if (return_unknown) else (tokens))
 
 class BasicStringTokenizer(nltk.tokenize.RegexpTokenizer):
 
-    def __init__(self, pattern : Optional[ str ] = "[a-zA-Z0-9\']+", *args, **kwargs) -> None:
+    def __init__(self, pattern : Optional[ str ] = "[a-zA-Z0-9\']+", *args, contraction_table_size : Optional[ int ] = 1 << 16, **kwargs) -> None:
         assert ("'" in pattern)
         super(BasicStringTokenizer, self).__init__(pattern, *args, **kwargs)
+        self.contraction_table_size = contraction_table_size 
+        self.contraction_table = self.compile_contraction_table()
+
+    @staticmethod 
+    def compile_contraction_table() -> Dict[ str, List[ str ] ]:
+        # token with apostrophe => symbol-free tokens of "contractions.fix(token)"
+        contraction_table = dict()
+        for contraction_dict_name in ("contractions_dict", "leftovers_dict"):
+            for contraction in getattr(contractions, contraction_dict_name, dict()):
+                if ("'" in contraction) and (" " not in contraction):
+                    contraction_table[contraction] = SYMBOL_FREE_TOKEN.findall(contractions.fix(contraction))
+        return contraction_table 
  
     def expand_contractions_within_list(self, tokens : List[ str ], make_copy : Optional[ bool ] = False) -> List[ str ]:
         if (make_copy):
@@ -87,47 +247,104 @@ class BasicStringTokenizer(nltk.tokenize.RegexpTokenizer):
                 tokens[ idx : idx + 1 ] = contractions.fix(token).split(" ")
         return tokens 
 
+    def tokenize_symbol_free(self, text : str, *args, **kwargs) -> List[ str ]:
+        # single pass equivalent of "remove_symbols(self.tokenize(text))"; contractions come from the table 
+        # (expansion and symbol removal share one loop, so they are timed together, apart from "regex")
+        contraction_table = self.contraction_table;  is_symbol_free = SYMBOL_FREE_TOKEN.fullmatch 
+        symbol_free_tokens = []
+        with metrics.stage("regex"):
+            tokens = super(BasicStringTokenizer, self).tokenize(text, *args, **kwargs)
+        with metrics.stage("contractions+remove_symbols"):
+            for token in tokens:
+                if ("'" in token):
+                    expanded_tokens = contraction_table.get(token)
+                    if (expanded_tokens is None):
+                        expanded_tokens = SYMBOL_FREE_TOKEN.findall(contractions.fix(token))
+                        if (len(contraction_table) < self.contraction_table_size):
+                            contraction_table[token] = expanded_tokens 
+                    symbol_free_tokens.extend(expanded_tokens)
+                elif (is_symbol_free(token)):
+                    symbol_free_tokens.append(token)
+                else:
+                    symbol_free_tokens.extend(SYMBOL_FREE_TOKEN.findall(token))
+        metrics.count_tokens("contractions+remove_symbols", len(symbol_free_tokens))
+        return symbol_free_tokens 
+
     def tokenize(self, text : str, *args, **kwargs) -> List[ str ]:
-        return self.expand_contractions_within_list(
-            super(BasicStringTokenizer, self).tokenize(text, *args, **kwargs)
-        )
+        with metrics.stage("regex"):
+            tokens = super(BasicStringTokenizer, self).tokenize(text, *args, **kwargs)
+        with metrics.stage("contractions"):
+            tokens = self.expand_contractions_within_list(tokens)
+        metrics.count_tokens("contractions", len(tokens))
+        return tokens 
 
 class TokensTaggingLemmatizer(nltk.stem.WordNetLemmatizer):
-    
-    nltk.download("averaged_perceptron_tagger")
 
     @staticmethod 
-    def wordnet_pos_tagging(tokens : List[ str ]) -> List[ Tuple[ str, str ] ]:
-        tokens = nltk.pos_tag(tokens)
-        for idx, (token, pos_tag) in enumerate(tokens):
-            if (pos_tag.startswith("J")):
-                tokens[idx] = (token, nltk.corpus.wordnet.ADJ)
-                continue 
-            if (pos_tag.startswith("V")):
-                tokens[idx] = (token, nltk.corpus.wordnet.VERB)
-                continue 
-            if (pos_tag.startswith("R")):
-                tokens[idx] = (token, nltk.corpus.wordnet.ADV)
-                continue 
-            tokens[idx] = (token, nltk.corpus.wordnet.NOUN)
-        return tokens 
+    def wordnet_pos(pos_tag : str) -> str:
+        if (pos_tag.startswith("J")):
+            return nltk.corpus.wordnet.ADJ 
+        if (pos_tag.startswith("V")):
+            return nltk.corpus.wordnet.VERB 
+        if (pos_tag.startswith("R")):
+            return nltk.corpus.wordnet.ADV 
+        return nltk.corpus.wordnet.NOUN 
+
+    def wordnet_pos_tagging(self, tokens : List[ str ]) -> List[ Tuple[ str, str ] ]:
+        return [  (token, self.wordnet_pos(pos_tag)) for token, pos_tag in self.tagger.tag(tokens)  ]
 
-    def __init__(self) -> None:
+    def wordnet_pos_tagging_batch(self, list_of_tokens : List[ List[ str ] ]) -> List[ List[ Tuple[ str, str ] ] ]:
+        return [
+            [  (token, self.wordnet_pos(pos_tag)) for token, pos_tag in tagged_tokens  ]
+                for tagged_tokens in self.tagger.tag_sents(list_of_tokens)
+        ]
+
+    def __init__(self, cache_size : Optional[ int ] = 1 << 18) -> None:
         super(TokensTaggingLemmatizer, self).__init__()
+        # "nltk.pos_tag" would construct (and unpickle) a new tagger on every call 
+        self.tagger = nltk.tag.PerceptronTagger()
+        # memo table keyed on (token, wordnet_pos); least recently used pairs are evicted 
+        self._lemmatize_pair = functools.lru_cache(maxsize = cache_size)(
+            super(TokensTaggingLemmatizer, self).lemmatize
+        )
 
     def lemmatize(self, tokens : List[ str ]) -> List[ str ]:
-        tokens = self.wordnet_pos_tagging(tokens)
-        for idx, token_tag_pair in enumerate(tokens):
-            tokens[idx] = super(TokensTaggingLemmatizer, self).lemmatize(*token_tag_pair)
+        with metrics.stage("tagging"):
+            tagged_tokens = self.wordnet_pos_tagging(tokens)
+        with metrics.stage("lemmatization"):
+            tokens = [  self._lemmatize_pair(*token_tag_pair) for token_tag_pair in tagged_tokens  ]
+        metrics.count_tokens("lemmatization", len(tokens))
         return tokens 
 
+    def lemmatize_batch(self, list_of_tokens : List[ List[ str ] ]) -> List[ List[ str ] ]:
+        lemmatize_pair = self._lemmatize_pair
+        with metrics.stage("tagging"):
+            list_of_tagged_tokens = self.wordnet_pos_tagging_batch(list_of_tokens)
+        with metrics.stage("lemmatization"):
+            list_of_tokens = [
+                [  lemmatize_pair(*token_tag_pair) for token_tag_pair in tagged_tokens  ]
+                    for tagged_tokens in list_of_tagged_tokens
+            ]
+        metrics.count_tokens("lemmatization", sum(map(len, list_of_tokens)))
+        return list_of_tokens 
+
+    def cache_statistics(self) -> Dict[ str, int ]:
+        cache_info = self._lemmatize_pair.cache_info()
+        return {  "hits" : cache_info.hits, "misses" : cache_info.misses, "size" : cache_info.currsize, "max_size" : cache_info.maxsize  }
+
+    def clear_cache(self) -> None:
+        self._lemmatize_pair.cache_clear()
+
 class StopWordRemover:
 
     def __init__(self, stopwords : Set[ str ]) -> None:
         self.stopwords = stopwords 
 
     def remove(self, tokens : List[ str ]) -> List[ str ]:
-        return list(filter(lambda x : not self.stopwords.__contains__(x.lower()), tokens))
+        with metrics.stage("stopwords"):
+            tokens = list(filter(lambda x : not self.stopwords.__contains__(x.lower()), tokens))
+        metrics.count_tokens("stopwords", len(tokens))
+        return tokens 
 
 class CustomWordSet(set):
 
@@ -136,4 +353,87 @@ class CustomWordSet(set):
         self.update(set(filter("".__ne__, open(filename, "r", encoding = "utf-8").read().split("\n"))))
      
 def remove_symbols(tokens : List[ str ]) -> List[ str ]:
-    return re.findall("[a-zA-Z0-9]+", " ".join(tokens))
\ No newline at end of file
+    with metrics.stage("remove_symbols"):
+        tokens = SYMBOL_FREE_TOKEN.findall(" ".join(tokens))
+    metrics.count_tokens("remove_symbols", len(tokens))
+    return tokens 
+
+class _SymbolStopWordRemover:
+
+    # "remove_symbols" fused with the "StopWordRemover" that follows it: one pass, no intermediate list 
+    def __init__(self, stopword_remover : StopWordRemover) -> None:
+        self.stopwords = stopword_remover.stopwords 
+
+    def remove(self, tokens : List[ str ]) -> List[ str ]:
+        stopwords = self.stopwords 
+        with metrics.stage("remove_symbols+stopwords"):
+            tokens = [  token for token in SYMBOL_FREE_TOKEN.findall(" ".join(tokens)) if (token.lower() not in stopwords)  ]
+        metrics.count_tokens("remove_symbols+stopwords", len(tokens))
+        return tokens 
+
+class Pipeline:
+
+    # stages: "BasicStringTokenizer", "remove_symbols", "LetterCaseOptimizer", "TokensTaggingLemmatizer", 
+    # "StopWordRemover" or any per-document callable; consecutive per-document stages run in a single loop 
+    def __init__(self, stages : List[ Any ]) -> None:
+        self.stages = list(stages)
+        self.batch_functions = self.compile(self.stages)
+
+    @staticmethod 
+    def fuse(stages : List[ Any ]) -> List[ Any ]:
+        fused_stages = []
+        for stage in stages:
+            if (stage is remove_symbols) and (len(fused_stages)) and (isinstance(fused_stages[-1], BasicStringTokenizer)):
+                fused_stages[-1] = fused_stages[-1].tokenize_symbol_free 
+                continue 
+            if (isinstance(stage, StopWordRemover)) and (len(fused_stages)) and (fused_stages[-1] is remove_symbols):
+                fused_stages[-1] = _SymbolStopWordRemover(stage)
+                continue 
+            fused_stages.append(stage)
+        return fused_stages 
+
+    @staticmethod 
+    def document_function(stage : Any) -> Callable[ [ Any ], Any ]:
+        if (isinstance(stage, BasicStringTokenizer)):
+            return stage.tokenize 
+        if (isinstance(stage, LetterCaseOptimizer)):
+            return stage.optimize 
+        if (isinstance(stage, (StopWordRemover, _SymbolStopWordRemover))):
+            return stage.remove 
+        if (callable(stage)):
+            return stage 
+        raise TypeError(f"Unsupported pipeline stage: {stage!r}")
+
+    @classmethod 
+    def compile(class_, stages : List[ Any ]) -> List[ Callable[ [ List[ Any ] ], List[ Any ] ] ]:
+
+        def run_documents(document_functions : List[ Callable[ [ Any ], Any ] ]) -> Callable[ [ List[ Any ] ], List[ Any ] ]:
+            def run_batch(documents : List[ Any ]) -> List[ Any ]:
+                results = []
+                for document in documents:
+                    for document_function in document_functions:
+                        document = document_function(document)
+                    results.append(document)
+                return results 
+            return run_batch 
+
+        batch_functions = [];  document_functions = []
+        for stage in class_.fuse(stages):
+            if (isinstance(stage, TokensTaggingLemmatizer)):
+                if (len(document_functions)):
+                    batch_functions.append(run_documents(document_functions))
+                    document_functions = []
+                batch_functions.append(stage.lemmatize_batch)
+                continue 
+            document_functions.append(class_.document_function(stage))
+        if (len(document_functions)):
+            batch_functions.append(run_documents(document_functions))
+        return batch_functions 
+
+    def run(self, documents : List[ Any ]) -> List[ Any ]:
+        for batch_function in self.batch_functions:
+            documents = batch_function(documents)
+        return documents 
+
+    def __call__(self, document : Any) -> Any:
+        return self.run([ document ])[0]
@@ -0,0 +1,133 @@
+import json, time, sys
+from typing import *
+
+class _NullStage:
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _StageTimer:
+
+    __slots__ = ("statistics", "start_time")
+
+    def __init__(self, statistics : List[ float ]) -> None:
+        self.statistics = statistics
+
+    def __enter__(self) -> None:
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> bool:
+        self.statistics[0] += 1
+        self.statistics[1] += time.perf_counter() - self.start_time
+        return False
+
+class PipelineMetrics:
+
+    # per stage: [ calls, seconds, tokens ]; a disabled instance hands out one shared no-op context manager
+    def __init__(self, enabled : Optional[ bool ] = False) -> None:
+        self.enabled = enabled
+        self.stages = dict()
+        self.caches = dict()
+        self.merged_caches = dict()
+
+    def _statistics(self, stage_name : str) -> List[ float ]:
+        statistics = self.stages.get(stage_name)
+        if (statistics is None):
+            statistics = self.stages[stage_name] = [ 0, 0.0, 0 ]
+        return statistics
+
+    def stage(self, stage_name : str) -> Union[ _StageTimer, _NullStage ]:
+        if not (self.enabled):
+            return _NULL_STAGE
+        return _StageTimer(self._statistics(stage_name))
+
+    def count_tokens(self, stage_name : str, num_tokens : int) -> None:
+        if (self.enabled):
+            self._statistics(stage_name)[2] += num_tokens
+
+    def register_cache(self, cache_name : str, cache_statistics : Callable[ [], Dict[ str, int ] ]) -> None:
+        # "cache_statistics" returns at least { "hits" : ..., "misses" : ... } and is read at export time
+        self.caches[cache_name] = cache_statistics
+
+    def drain(self) -> Dict[ str, Any ]:
+        # hands the accumulated counters over (e.g. from a worker process) and starts again from zero
+        snapshot = {  "stages" : self.stages, "caches" : {  cache_name : dict(cache_statistics()) for cache_name, cache_statistics in self.caches.items()  }  }
+        self.stages = dict()
+        return snapshot
+
+    def merge(self, snapshot : Dict[ str, Any ], source : Optional[ str ] = "") -> None:
+        for stage_name, (calls, seconds, tokens) in snapshot["stages"].items():
+            statistics = self._statistics(stage_name)
+            statistics[0] += calls;  statistics[1] += seconds;  statistics[2] += tokens
+        # cache statistics are cumulative, so the latest snapshot of each source replaces the previous one
+        for cache_name, cache_statistics in snapshot["caches"].items():
+            self.merged_caches[cache_name + source] = cache_statistics
+
+    def summary(self) -> Dict[ str, Any ]:
+        caches = dict()
+        all_caches = {  cache_name : cache_statistics() for cache_name, cache_statistics in self.caches.items()  }
+        all_caches.update(self.merged_caches)
+        for cache_name, cache_statistics in all_caches.items():
+            cache_statistics = dict(cache_statistics)
+            lookups = cache_statistics.get("hits", 0) + cache_statistics.get("misses", 0)
+            cache_statistics["hit_rate"] = cache_statistics.get("hits", 0) / max(lookups, 1)
+            caches[cache_name] = cache_statistics
+        return {
+            "stages" : {
+                stage_name : {  "calls" : calls, "seconds" : seconds, "tokens" : tokens, "tokens_per_second" : tokens / max(seconds, 1e-9)  }
+                    for stage_name, (calls, seconds, tokens) in self.stages.items()
+            },
+            "caches" : caches
+        }
+
+    def export_json(self, filename : str) -> None:
+        with open(filename, "w", encoding = "utf-8") as wf:
+            json.dump(self.summary(), wf, indent = 2)
+
+    def export_prometheus(self, filename : str, prefix : Optional[ str ] = "sentiment_pipeline") -> None:
+        summary = self.summary();  lines = []
+        for metric_name, metric_type, section, field in (
+            ("stage_calls_total",   "counter", "stages", "calls"),
+            ("stage_seconds_total", "counter", "stages", "seconds"),
+            ("stage_tokens_total",  "counter", "stages", "tokens"),
+            ("cache_hits_total",    "counter", "caches", "hits"),
+            ("cache_misses_total",  "counter", "caches", "misses"),
+            ("cache_hit_rate",      "gauge",   "caches", "hit_rate")
+        ):
+            lines.append(f"# TYPE {prefix}_{metric_name} {metric_type}")
+            label_name = (("stage") if (section == "stages") else ("cache"))
+            for name, statistics in sorted(summary[section].items()):
+                lines.append(f"{prefix}_{metric_name}{{{label_name}=\"{name}\"}} {statistics.get(field, 0)}")
+        with open(filename, "w", encoding = "utf-8") as wf:
+            wf.write("\n".join(lines) + "\n")
+
+class ProgressReporter:
+
+    # rewrites the progress line at most once per "min_interval" seconds instead of once per row
+    def __init__(self, label : str, total : int, min_interval : Optional[ float ] = 0.5, verbose : Optional[ bool ] = True) -> None:
+        self.label = label
+        self.total = total
+        self.min_interval = min_interval
+        self.verbose = verbose
+        self.completed = 0
+        self.last_report = 0.0
+
+    def update(self, num_completed : Optional[ int ] = 1) -> None:
+        self.completed += num_completed
+        if (self.verbose) and (time.perf_counter() - self.last_report >= self.min_interval):
+            self.last_report = time.perf_counter()
+            sys.stdout.write("\r{0}: {1:.1f}%".format(self.label, self.completed / max(self.total, 1) * 100))
+            sys.stdout.flush()
+
+    def finish(self) -> None:
+        if (self.verbose):
+            sys.stdout.write("\r{0}: 100.0%".format(self.label))
+            print("")
+
+# shared by the "nlp_utils" stages; disabled unless an entry point turns it on
+metrics = PipelineMetrics()
@@ -0,0 +1,106 @@
+from corpus_io import ARCHIVE_SEPARATOR, split_source, open_source, iterate_sources
+import hashlib, json, time, os
+from typing import *
+
+def stream_digest(rf : IO[ bytes ], block_size : Optional[ int ] = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    for block in iter(lambda : rf.read(block_size), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+def file_digest(filename : str, block_size : Optional[ int ] = 1 << 20) -> str:
+    # "filename" may also name an archive member ("<archive>::<member>")
+    with open_source(filename) as rf:
+        return stream_digest(rf, block_size)
+
+def files_digest(filenames : List[ str ], block_size : Optional[ int ] = 1 << 20) -> Dict[ str, str ]:
+    # "file_digest" of many files, reading every archive once
+    return {  filename : stream_digest(rf, block_size) for filename, rf in iterate_sources(filenames)  }
+
+def parameters_digest(parameters : Dict[ str, Any ]) -> str:
+    # file-valued parameters (dictionaries, stopwords) should be passed through "file_digest" by the caller
+    return hashlib.sha256(json.dumps(parameters, sort_keys = True, default = str).encode("utf-8")).hexdigest()
+
+def files_stat_digest(filenames : List[ str ]) -> str:
+    # cheap identity (path, size, mtime) of local files, for caches derived from them
+    return parameters_digest([  [ os.path.abspath(filename), os.stat(filename).st_size, os.stat(filename).st_mtime_ns ] for filename in filenames  ])
+
+class ProcessingManifest:
+
+    VERSION = 1
+
+    def __init__(self, filename : str) -> None:
+        self.filename = filename
+        self.entries = dict()
+        # hashes computed in bulk by "pending", reused by "record" while size and mtime are unchanged
+        self.digests = dict()
+        if (os.path.exists(filename)):
+            with open(filename, "r", encoding = "utf-8") as rf:
+                manifest = json.load(rf)
+            if (manifest.get("version") == self.VERSION):
+                self.entries = manifest["entries"]
+
+    @staticmethod 
+    def _key(input_filename : str) -> str:
+        container, member = split_source(input_filename)
+        return os.path.abspath(container) + ((ARCHIVE_SEPARATOR + member) if (member is not None) else (""))
+
+    def _known_digest(self, input_filename : str) -> Union[ str, None ]:
+        # a recorded (or bulk computed) hash stays valid while size and mtime are unchanged
+        stat = os.stat(split_source(input_filename)[0])
+        for entry in (self.entries.get(self._key(input_filename)), self.digests.get(self._key(input_filename))):
+            if (entry is not None) and (entry["size"] == stat.st_size) and (entry["mtime"] == stat.st_mtime):
+                return entry["hash"]
+        return None
+
+    def _content_digest(self, input_filename : str) -> str:
+        digest = self._known_digest(input_filename)
+        return ((digest) if (digest is not None) else (file_digest(input_filename)))
+
+    def is_current(self, input_filename : str, parameters : Dict[ str, Any ]) -> bool:
+        entry = self.entries.get(self._key(input_filename))
+        return (
+            (entry is not None)
+                and (entry["parameters"] == parameters_digest(parameters))
+                and (entry["hash"] == self._content_digest(input_filename))
+                and (os.path.exists(entry["output"]))
+        )
+
+    def pending(self, input_filenames : List[ str ], parameters : Dict[ str, Any ]) -> List[ str ]:
+        # inputs without a reusable hash are hashed together (one pass per archive instead of one per member)
+        for input_filename, digest in files_digest([  input_filename for input_filename in input_filenames if (self._known_digest(input_filename) is None)  ]).items():
+            stat = os.stat(split_source(input_filename)[0])
+            self.digests[self._key(input_filename)] = {  "hash" : digest, "size" : stat.st_size, "mtime" : stat.st_mtime  }
+        return [  input_filename for input_filename in input_filenames if not (self.is_current(input_filename, parameters))  ]
+
+    def output(self, input_filename : str) -> Union[ str, None ]:
+        entry = self.entries.get(self._key(input_filename))
+        return ((entry["output"]) if (entry is not None) else (None))
+
+    def record(self, input_filename : str, parameters : Dict[ str, Any ], output_filename : str) -> None:
+        stat = os.stat(split_source(input_filename)[0])
+        self.entries[self._key(input_filename)] = {
+            "hash"       : self._content_digest(input_filename),
+            "size"       : stat.st_size,
+            "mtime"      : stat.st_mtime,
+            "parameters" : parameters_digest(parameters),
+            "output"     : output_filename,
+            "completed"  : time.time()
+        }
+        self.save()
+
+    def prune(self, input_filenames : List[ str ]) -> List[ str ]:
+        # forgets inputs that no longer exist among "input_filenames" and returns their outputs
+        current_keys = set(map(self._key, input_filenames))
+        stale_keys = [  key for key in self.entries if (key not in current_keys)  ]
+        stale_outputs = [  self.entries.pop(key)["output"] for key in stale_keys  ]
+        if (stale_keys):
+            self.save()
+        return stale_outputs
+
+    def save(self) -> None:
+        # write-then-rename so a crash never leaves a truncated manifest behind
+        temporary_filename = self.filename + ".tmp"
+        with open(temporary_filename, "w", encoding = "utf-8") as wf:
+            json.dump({  "version" : self.VERSION, "entries" : self.entries  }, wf, indent = 1)
+        os.replace(temporary_filename, self.filename)
@@ -0,0 +1,204 @@
+from corpus_io import require_pyarrow, pyarrow
+import hashlib, pandas, json, glob, os
+from typing import *
+
+class ReviewDeduplicator:
+
+    # remembers 16-byte digests of the review texts instead of the texts
+    def __init__(self) -> None:
+        self.digests = set()
+
+    def is_new(self, content : str) -> bool:
+        digest = hashlib.blake2b(content.encode("utf-8"), digest_size = 16).digest()
+        if (digest in self.digests):
+            return False
+        self.digests.add(digest)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+class ReviewBuffer:
+
+    # in-memory stand-in for "ReviewSink" (same interface, nothing is persisted)
+    def __init__(self) -> None:
+        self.deduplicator = ReviewDeduplicator()
+        self.reviews = []
+        self.cursor = None
+        self.finished = False
+
+    @property
+    def num_reviews(self) -> int:
+        return len(self.reviews)
+
+    def append(self, voting : str, content : str) -> bool:
+        if not (self.deduplicator.is_new(content)):
+            return False
+        self.reviews.append((voting, content))
+        return True
+
+    def checkpoint(self, cursor : Optional[ Any ] = None) -> None:
+        self.cursor = cursor
+
+class ReviewSink:
+
+    FORMATS = ("csv", "jsonl", "parquet")
+
+    COLUMNS = [ "voting", "content" ]
+
+    # appends reviews to "filename" in batches; "<filename>.checkpoint.json" marks what is durable while the game is partial
+    # (it is written before the first review and removed last by "close", so an output without it is a finished game, kept as it is)
+    # "heartbeat" runs on every checkpoint call (before anything is written) and may raise to stop a worker that lost its job
+    def __init__(self, filename   : str,
+                       batch_size : Optional[ int ] = 500,
+                       encoding   : Optional[ str ] = "utf-8",
+                       heartbeat  : Optional[ Callable[ [], None ] ] = None) -> None:
+        self.filename = filename
+        self.heartbeat = heartbeat
+        self.output_format = os.path.splitext(filename)[1][1:].lower()
+        assert (self.output_format in self.FORMATS)
+        if (self.output_format == "parquet"):
+            require_pyarrow()
+        self.checkpoint_filename = filename + ".checkpoint.json"
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.deduplicator = ReviewDeduplicator()
+        self.buffer = []
+        self.num_committed = 0
+        self.size = 0
+        self.cursor = None
+        self.finished = False
+        self._resume()
+
+    @property
+    def num_reviews(self) -> int:
+        return self.num_committed + len(self.buffer)
+
+    def _part_filenames(self) -> List[ str ]:
+        # Parquet files cannot be appended to, so every checkpoint writes one part (merged by "close")
+        return sorted(glob.glob(glob.escape(self.filename) + ".part-*"))
+
+    def _resume(self) -> None:
+        if not (os.path.exists(self.checkpoint_filename)):
+            if (os.path.exists(self.filename)):
+                self._resume_finished()
+                return
+            # parts without a checkpoint (or a merged output) were never committed
+            for part_filename in self._part_filenames():
+                os.remove(part_filename)
+            self._write_checkpoint()
+            return
+        if (self.output_format == "parquet") and (os.path.exists(self.filename)):
+            # "close" merged the parts but stopped before cleaning them up
+            self._resume_finished()
+            return
+        with open(self.checkpoint_filename, "r", encoding = "utf-8") as rf:
+            checkpoint = json.load(rf)
+        self.num_committed = checkpoint["num_reviews"]
+        self.size = checkpoint["size"]
+        self.cursor = checkpoint["cursor"]
+        if (self.output_format == "parquet"):
+            for part_filename in self._part_filenames()[ self.size : ]:
+                os.remove(part_filename)
+        elif (os.path.exists(self.filename)):
+            # drop whatever was written after the last checkpoint
+            with open(self.filename, "r+b") as wf:
+                wf.truncate(self.size)
+        for content in self._iterate_committed_contents():
+            self.deduplicator.is_new(content)
+
+    def _resume_finished(self) -> None:
+        # nothing is appended to a finished game and "close" leaves it as it is
+        self.finished = True
+        for filename in [ self.checkpoint_filename ] + self._part_filenames():
+            if (os.path.exists(filename)):
+                os.remove(filename)
+        if (self.output_format == "parquet"):
+            self.num_committed = pyarrow.parquet.read_metadata(self.filename).num_rows
+            return
+        self.size = os.path.getsize(self.filename)
+        self.num_committed = sum(1 for _ in self._iterate_committed_contents())
+
+    def _iterate_committed_contents(self) -> Iterator[ str ]:
+        if (self.output_format == "parquet"):
+            for part_filename in self._part_filenames():
+                yield from pyarrow.parquet.read_table(part_filename, columns = [ "content" ]).column(0).to_pylist()
+        elif (self.size == 0):
+            return
+        elif (self.output_format == "csv"):
+            for chunk in pandas.read_csv(self.filename, encoding = self.encoding, usecols = [ "content" ], dtype = str, keep_default_na = False, chunksize = 10000):
+                yield from chunk["content"].tolist()
+        else:
+            with open(self.filename, "r", encoding = self.encoding) as rf:
+                for line in rf:
+                    yield json.loads(line)["content"]
+
+    def _remove_outputs(self) -> None:
+        for filename in [ self.filename, self.checkpoint_filename ] + self._part_filenames():
+            if (os.path.exists(filename)):
+                os.remove(filename)
+
+    def append(self, voting : str, content : str) -> bool:
+        if (self.finished) or not (self.deduplicator.is_new(content)):
+            return False
+        self.buffer.append((voting, content))
+        if (len(self.buffer) >= self.batch_size):
+            self.checkpoint(self.cursor)
+        return True
+
+    def _write_buffer(self) -> None:
+        dataframe = pandas.DataFrame(self.buffer, columns = self.COLUMNS)
+        if (self.output_format == "parquet"):
+            dataframe.to_parquet(self.filename + ".part-{0:05d}".format(self.size), engine = "pyarrow", index = False)
+            self.size += 1
+            return
+        with open(self.filename, "a", encoding = self.encoding, newline = "") as wf:
+            if (self.output_format == "csv"):
+                dataframe.to_csv(wf, header = (self.size == 0), index = False)
+            else:
+                wf.writelines(json.dumps(dict(zip(self.COLUMNS, review)), ensure_ascii = False) + "\n" for review in self.buffer)
+            wf.flush()
+            os.fsync(wf.fileno())
+            self.size = wf.tell()
+
+    def checkpoint(self, cursor : Optional[ Any ] = None) -> None:
+        # "cursor" lets an engine continue where it stopped (e.g. the next review page); it must be JSON serializable
+        if (self.finished):
+            return
+        if (self.heartbeat is not None):
+            self.heartbeat()
+        if not (self.buffer) and (cursor == self.cursor):
+            return
+        if (self.buffer):
+            self._write_buffer()
+            self.num_committed += len(self.buffer)
+            self.buffer = []
+        self.cursor = cursor
+        self._write_checkpoint()
+
+    def _write_checkpoint(self) -> None:
+        # write-then-rename so a crash never leaves a truncated checkpoint behind
+        temporary_filename = self.checkpoint_filename + ".tmp"
+        with open(temporary_filename, "w", encoding = "utf-8") as wf:
+            json.dump({  "num_reviews" : self.num_committed, "size" : self.size, "cursor" : self.cursor  }, wf)
+        os.replace(temporary_filename, self.checkpoint_filename)
+
+    def close(self) -> bool:
+        # finishes the game; returns "False" (and leaves nothing behind) if no review was scraped
+        if (self.finished):
+            return True
+        self.checkpoint(self.cursor)
+        if (self.num_committed == 0):
+            self._remove_outputs()
+            return False
+        if (self.output_format == "parquet"):
+            part_filenames = self._part_filenames()
+            temporary_filename = self.filename + ".tmp"
+            with pyarrow.parquet.ParquetWriter(temporary_filename, pyarrow.parquet.read_schema(part_filenames[0])) as writer:
+                for part_filename in part_filenames:
+                    writer.write_table(pyarrow.parquet.read_table(part_filename))
+            os.replace(temporary_filename, self.filename)
+            for part_filename in part_filenames:
+                os.remove(part_filename)
+        os.remove(self.checkpoint_filename)
+        return True
@@ -0,0 +1,156 @@
+import contextlib, sqlite3, uuid, time
+from typing import *
+
+class LeaseLost(Exception):
+    # the job was reclaimed by another worker (its lease expired) or finished elsewhere
+    pass
+
+class ScrapeJobQueue:
+
+    STATE_PENDING     = "pending"
+
+    STATE_IN_PROGRESS = "in_progress"
+
+    STATE_DONE        = "done"
+
+    STATE_FAILED      = "failed"
+
+    # one instance per worker (thread / coroutine / process); claims are serialized by "BEGIN IMMEDIATE" on the shared file
+    def __init__(self, filename        : str,
+                       max_attempts    : Optional[ int   ] = 5,
+                       backoff_seconds : Optional[ float ] = 30.0,
+                       lease_seconds   : Optional[ float ] = 3600.0) -> None:
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.connection = sqlite3.connect(filename, timeout = 60, isolation_level = None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # "available_time" is the earliest retry of a pending job and the lease expiry of an in-progress one
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                url            TEXT    NOT NULL UNIQUE,
+                state          TEXT    NOT NULL,
+                attempts       INTEGER NOT NULL DEFAULT 0,
+                available_time REAL    NOT NULL DEFAULT 0,
+                updated_time   REAL    NOT NULL DEFAULT 0,
+                last_error     TEXT,
+                claim_token    TEXT
+            )
+        """)
+        # queues created before claim tokens existed
+        if ("claim_token" not in [  column[1] for column in self.connection.execute("PRAGMA table_info(jobs)")  ]):
+            self.connection.execute("ALTER TABLE jobs ADD COLUMN claim_token TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_availability ON jobs (state, available_time)")
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[ sqlite3.Connection ]:
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.connection
+        except (BaseException):
+            self.connection.execute("ROLLBACK")
+            raise
+        else:
+            self.connection.execute("COMMIT")
+
+    def enqueue(self, urls : Iterable[ str ]) -> int:
+        # already known urls keep their state
+        with self._transaction() as connection:
+            return connection.executemany(
+                "INSERT OR IGNORE INTO jobs (url, state, updated_time) VALUES (?, ?, ?)",
+                [  (url, self.STATE_PENDING, time.time()) for url in urls  ]
+            ).rowcount
+
+    def claim(self) -> Union[ Tuple[ int, str, int, str ], None ]:
+        # returns ( job_id, url, attempt #, claim token ) of the oldest available job, or "None" if nothing is available right now
+        current_time = time.time()
+        claim_token = uuid.uuid4().hex
+        with self._transaction() as connection:
+            # in-progress jobs whose lease ran out belong to a crashed (or hung) worker and count as a failed attempt
+            connection.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, claim_token = NULL, updated_time = ? WHERE state = ? AND available_time <= ? AND attempts >= ?",
+                (self.STATE_FAILED, "lease expired", current_time, self.STATE_IN_PROGRESS, current_time, self.max_attempts)
+            )
+            job = connection.execute(
+                "SELECT job_id, url, attempts FROM jobs WHERE state IN (?, ?) AND available_time <= ? ORDER BY job_id LIMIT 1",
+                (self.STATE_PENDING, self.STATE_IN_PROGRESS, current_time)
+            ).fetchone()
+            if (job is None):
+                return None
+            connection.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, available_time = ?, updated_time = ?, claim_token = ? WHERE job_id = ?",
+                (self.STATE_IN_PROGRESS, current_time + self.lease_seconds, current_time, claim_token, job[0])
+            )
+        return (job[0], job[1], job[2] + 1, claim_token)
+
+    def renew(self, job_id : int, claim_token : str) -> bool:
+        # heartbeat of a running job; "False" once the job belongs to another claim
+        current_time = time.time()
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET available_time = ?, updated_time = ? WHERE job_id = ? AND state = ? AND claim_token = ?",
+                (current_time + self.lease_seconds, current_time, job_id, self.STATE_IN_PROGRESS, claim_token)
+            ).rowcount == 1
+
+    def complete(self, job_id : int, claim_token : str) -> bool:
+        # no-op (returns "False") for a stale claim
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET state = ?, last_error = NULL, claim_token = NULL, updated_time = ? WHERE job_id = ? AND state = ? AND claim_token = ?",
+                (self.STATE_DONE, time.time(), job_id, self.STATE_IN_PROGRESS, claim_token)
+            ).rowcount == 1
+
+    def fail(self, job_id : int, claim_token : str, error : str) -> bool:
+        # retried with exponential backoff until "max_attempts" is reached; no-op (returns "False") for a stale claim
+        current_time = time.time()
+        with self._transaction() as connection:
+            job = connection.execute(
+                "SELECT attempts FROM jobs WHERE job_id = ? AND state = ? AND claim_token = ?", (job_id, self.STATE_IN_PROGRESS, claim_token)
+            ).fetchone()
+            if (job is None):
+                return False
+            connection.execute(
+                "UPDATE jobs SET state = ?, available_time = ?, last_error = ?, claim_token = NULL, updated_time = ? WHERE job_id = ?", (
+                    ((self.STATE_FAILED) if (job[0] >= self.max_attempts) else (self.STATE_PENDING)),
+                    current_time + self.backoff_seconds * (2 ** (job[0] - 1)), error, current_time, job_id
+                )
+            )
+        return True
+
+    def retry_failed(self) -> int:
+        with self._transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, available_time = 0, updated_time = ? WHERE state = ?", (self.STATE_PENDING, time.time(), self.STATE_FAILED)
+            ).rowcount
+
+    def next_available_time(self) -> Union[ float, None ]:
+        # "None" once every job is done or failed
+        return self.connection.execute(
+            "SELECT MIN(available_time) FROM jobs WHERE state IN (?, ?)", (self.STATE_PENDING, self.STATE_IN_PROGRESS)
+        ).fetchone()[0]
+
+    def counts(self) -> Dict[ str, int ]:
+        counts = dict.fromkeys((self.STATE_PENDING, self.STATE_IN_PROGRESS, self.STATE_DONE, self.STATE_FAILED), 0)
+        counts.update(self.connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return counts
+
+    def close(self) -> None:
+        self.connection.close()
+
+class JobLease:
+
+    # renews the claim of one job at most every quarter lease; raises "LeaseLost" once another worker owns the job
+    def __init__(self, job_queue : ScrapeJobQueue, job_id : int, claim_token : str) -> None:
+        self.job_queue = job_queue
+        self.job_id = job_id
+        self.claim_token = claim_token
+        self.renew_interval = job_queue.lease_seconds / 4
+        self.last_renewal = time.monotonic()
+
+    def renew(self) -> None:
+        if (time.monotonic() - self.last_renewal < self.renew_interval):
+            return
+        if not (self.job_queue.renew(self.job_id, self.claim_token)):
+            raise LeaseLost(f"Job #{self.job_id} was reclaimed")
+        self.last_renewal = time.monotonic()
@@ -0,0 +1,267 @@
+from tokenizer import TokenizationChain
+from word_embed import DocumentEmbedder
+from db_utils import SentimentAnalysisDatabase
+from nlp_utils import download_corpora
+import asyncio, collections, numpy, json, time, os
+from typing import *
+
+class SoftmaxClassifier:
+
+    def __init__(self, weights : numpy.ndarray, bias : numpy.ndarray, labels : List[ str ]) -> None:
+        self.weights = weights
+        self.bias = bias
+        self.labels = list(labels)
+
+    @classmethod
+    def fit(class_, features      : numpy.ndarray,
+                    targets       : numpy.ndarray,
+                    labels        : List[ str ],
+                    num_epochs    : Optional[ int   ] = 300,
+                    learning_rate : Optional[ float ] = 0.5,
+                    l2_penalty    : Optional[ float ] = 1e-4 ) -> "SoftmaxClassifier":
+        # full-batch gradient descent on standardized inputs, folded back into the weights afterwards
+        mean = features.mean(axis = 0);  scale = features.std(axis = 0) + 1e-6
+        standardized = (features - mean) / scale
+        one_hot = numpy.eye(len(labels), dtype = numpy.float32)[targets]
+        weights = numpy.zeros((features.shape[1], len(labels)), dtype = numpy.float32)
+        bias = numpy.zeros(len(labels), dtype = numpy.float32)
+        for _ in range(num_epochs):
+            probabilities = class_.softmax(standardized @ weights + bias)
+            gradient = (probabilities - one_hot) / len(features)
+            weights -= learning_rate * (standardized.T @ gradient + l2_penalty * weights)
+            bias -= learning_rate * gradient.sum(axis = 0)
+        weights = weights / scale[:, None]
+        return class_(weights, bias - mean @ weights, labels)
+
+    @staticmethod
+    def softmax(logits : numpy.ndarray) -> numpy.ndarray:
+        exponentials = numpy.exp(logits - logits.max(axis = 1, keepdims = True))
+        return exponentials / exponentials.sum(axis = 1, keepdims = True)
+
+    def predict_proba(self, features : numpy.ndarray) -> numpy.ndarray:
+        return self.softmax(features @ self.weights + self.bias)
+
+    def save(self, filename : str) -> None:
+        with open(filename, "wb") as wf:
+            numpy.savez(wf, weights = self.weights, bias = self.bias, labels = numpy.array(self.labels))
+
+    @classmethod
+    def load(class_, filename : str) -> "SoftmaxClassifier":
+        with numpy.load(filename) as archive:
+            return class_(archive["weights"], archive["bias"], archive["labels"].tolist())
+
+def train_classifier_from_database(database                : SentimentAnalysisDatabase,
+                                   embedder                : DocumentEmbedder,
+                                   max_documents_per_class : Optional[ int  ] = 50000,
+                                   batch_size              : Optional[ int  ] = 1024,
+                                   verbose                 : Optional[ bool ] = True   ) -> SoftmaxClassifier:
+    features = [];  targets = []
+    for sentiment in range(database.SENTIMENT_NEU, database.SENTIMENT_NEG + 1):
+        num_documents = 0
+        for batch in database.generate_batches(sentiment, database.DATA_TRAINING, batch_size):
+            batch = batch[ : max_documents_per_class - num_documents ]
+            features.append(embedder.embed(batch))
+            targets.extend([ sentiment ] * len(batch))
+            num_documents += len(batch)
+            if (num_documents >= max_documents_per_class):
+                break
+        if (verbose):
+            print("Collection: \"{0}\" # {1:,}".format(database.SENTIMENT_COLLECTION_NAMES[sentiment], num_documents))
+    return SoftmaxClassifier.fit(numpy.concatenate(features), numpy.array(targets), database.SENTIMENT_COLLECTION_NAMES)
+
+class LatencyTracker:
+
+    def __init__(self, window_size : Optional[ int ] = 10000) -> None:
+        self.latencies = collections.deque(maxlen = window_size)
+        self.num_requests = 0
+
+    def record(self, seconds : float) -> None:
+        self.latencies.append(seconds)
+        self.num_requests += 1
+
+    def summary(self) -> Dict[ str, float ]:
+        latencies = numpy.array(self.latencies, dtype = numpy.float64) * 1000
+        percentiles = numpy.percentile(latencies, [ 50, 99 ]) if (len(latencies)) else ([ 0.0, 0.0 ])
+        return {  "requests" : self.num_requests, "p50_ms" : float(percentiles[0]), "p99_ms" : float(percentiles[1])  }
+
+class MicroBatcher:
+
+    # groups concurrent requests: a batch closes at "max_batch_size" texts or "max_wait" seconds after its first text
+    def __init__(self, predict_batch : Callable[ [ List[ str ] ], List[ Any ] ], max_batch_size : Optional[ int ] = 32, max_wait : Optional[ float ] = 0.005) -> None:
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # created on the running loop by "_bind" (before Python 3.10 they attach to the loop current at construction)
+        self.requests = None
+        self.arrival = None
+
+    def _bind(self) -> None:
+        if (self.requests is None):
+            self.requests = asyncio.Queue()
+            self.arrival = asyncio.Event()
+
+    async def submit(self, text : str) -> Any:
+        self._bind()
+        future = asyncio.get_running_loop().create_future()
+        await self.requests.put((text, future))
+        self.arrival.set()
+        return await future
+
+    async def run(self) -> None:
+        self._bind()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [ await self.requests.get() ]
+            deadline = loop.time() + self.max_wait
+            while (len(batch) < self.max_batch_size):
+                try:
+                    batch.append(self.requests.get_nowait())
+                    continue
+                except (asyncio.QueueEmpty):
+                    pass
+                timeout = deadline - loop.time()
+                if (timeout <= 0):
+                    break
+                # only the arrival signal is waited on (and cancelled on timeout), never a "get" that may already hold a request
+                self.arrival.clear()
+                try:
+                    await asyncio.wait_for(self.arrival.wait(), timeout)
+                except (asyncio.TimeoutError):
+                    break
+            texts, futures = zip(*batch)
+            try:
+                # tagging and vector math run off the event loop so requests keep being accepted
+                results = await loop.run_in_executor(None, self.predict_batch, list(texts))
+            except (Exception) as exception:
+                for future in futures:
+                    if not (future.done()):
+                        future.set_exception(exception)
+                continue
+            for future, result in zip(futures, results):
+                if not (future.done()):
+                    future.set_result(result)
+
+class SentimentService:
+
+    def __init__(self, chain : TokenizationChain, embedder : DocumentEmbedder, classifier : SoftmaxClassifier, max_batch_size : Optional[ int ] = 32, max_wait : Optional[ float ] = 0.005) -> None:
+        self.chain = chain
+        self.embedder = embedder
+        self.classifier = classifier
+        self.batcher = MicroBatcher(self.predict_batch, max_batch_size, max_wait)
+        self.latency = LatencyTracker()
+
+    def predict_batch(self, texts : List[ str ]) -> List[ Dict[ str, Any ] ]:
+        probabilities = self.classifier.predict_proba(self.embedder.embed(self.chain.tokenize_batch(texts)))
+        return [
+            {  "label" : self.classifier.labels[int(numpy.argmax(scores))], "scores" : dict(zip(self.classifier.labels, map(float, scores)))  }
+                for scores in probabilities
+        ]
+
+    async def predict(self, texts : List[ str ]) -> List[ Dict[ str, Any ] ]:
+        return await asyncio.gather(*(self.batcher.submit(text) for text in texts))
+
+    async def handle_request(self, method : str, path : str, body : bytes) -> Tuple[ int, Dict[ str, Any ] ]:
+        if (method == "GET") and (path == "/health"):
+            return (200, {  "status" : "ok"  })
+        if (method == "GET") and (path == "/metrics"):
+            return (200, {  "latency" : self.latency.summary()  })
+        if (method == "POST") and (path == "/predict"):
+            start_time = time.perf_counter()
+            try:
+                request = json.loads(body or b"{}")
+                texts = request["texts"] if ("texts" in request) else [ request["text"] ]
+                assert (isinstance(texts, list)) and all(isinstance(text, str) for text in texts)
+            except (ValueError, KeyError, TypeError, AssertionError):
+                return (400, {  "error" : "expected {\"text\" : str} or {\"texts\" : [str, ...]}"  })
+            predictions = await self.predict(texts)
+            self.latency.record(time.perf_counter() - start_time)
+            return (200, {  "predictions" : predictions  })
+        return (404, {  "error" : "not found"  })
+
+    async def handle_connection(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        # minimal HTTP/1.1 with keep-alive; requests carry JSON bodies sized by "Content-Length"
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not (request_line):
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = dict()
+                while True:
+                    header_line = (await reader.readline()).decode("latin-1").strip()
+                    if not (header_line):
+                        break
+                    name, _, value = header_line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    status, response = await self.handle_request(method, path, body)
+                except (Exception) as exception:
+                    status, response = (500, {  "error" : f"{type(exception).__name__}: {exception}"  })
+                payload = json.dumps(response).encode("utf-8")
+                writer.write((
+                    f"HTTP/1.1 {status} {'OK' if (status == 200) else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: keep-alive\r\n\r\n"
+                ).encode("latin-1") + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host : Optional[ str ] = "127.0.0.1", port : Optional[ int ] = 8080) -> None:
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"< Serving on http://{host}:{port} >")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+
+if (__name__ == "__main__"):
+
+
+    # >> PARAMETERS
+
+    custom_dictionaries = [
+        os.path.join(os.path.dirname(__file__), "dictionary/custom_words_neut.txt"),
+        os.path.join(os.path.dirname(__file__), "dictionary/custom_words_sent.txt")
+    ]
+
+    stopword_filename        = os.path.join(os.path.dirname(__file__), "dictionary/custom_stopwords.txt")
+
+    vocabulary_snapshot      = os.path.join(os.path.dirname(__file__), "dictionary/default_vocabulary.snapshot")
+
+    word2vec_model_name      = os.path.join(os.path.dirname(__file__), "dictionary/w2v_embedder.model")
+
+    classifier_filename      = os.path.join(os.path.dirname(__file__), "dictionary/sentiment_classifier.npz")
+
+    token_regular_expression = "[a-zA-Z0-9\']+"
+
+    database_uri             = "mongodb://localhost:27017"
+
+    host, port               = "127.0.0.1", 8080
+
+    max_batch_size           = 32
+
+    max_wait                 = 0.005
+
+    # << PARAMETERS
+
+
+    download_corpora(quiet = True)
+
+    chain = TokenizationChain(custom_dictionaries, stopword_filename, token_regular_expression, vocabulary_snapshot)
+
+    # vectors are memory-mapped read-only instead of being copied into the process
+    embedder = DocumentEmbedder.load(word2vec_model_name, mmap = "r")
+
+    if (os.path.exists(classifier_filename)):
+        classifier = SoftmaxClassifier.load(classifier_filename)
+    else:
+        classifier = train_classifier_from_database(SentimentAnalysisDatabase(database_uri), embedder)
+        classifier.save(classifier_filename)
+        print(f"Saved Classifier: \"{classifier_filename}\"")
+
+    asyncio.run(SentimentService(chain, embedder, classifier, max_batch_size, max_wait).serve(host, port))
@@ -3,9 +3,44 @@ from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.service import Service 
 from selenium.webdriver.common.by import By 
 from selenium import webdriver 
+from review_sink import ReviewBuffer, ReviewSink
+from scrape_queue import ScrapeJobQueue, JobLease
 from bs4 import BeautifulSoup
 from typing import *
-import threading, datetime, pandas, time, sys, os 
+import urllib.parse, aiohttp.web, threading, datetime, asyncio, aiohttp, pandas, html, time, sys, os 
+
+# outer HTML of the review cards from index "arguments[1]" onwards 
+NEW_REVIEW_CARDS_SCRIPT = "return Array.from(document.getElementsByClassName(arguments[0])).slice(arguments[1]).map(card => card.outerHTML);"
+
+def parse_review_posts(page_content : str, steam_scraper_config : Dict[ str, Any ]) -> List[ Tuple[ str, str ] ]:
+
+    review_posts = []
+
+    for game_review in BeautifulSoup(page_content, "lxml").find_all(class_ = steam_scraper_config["steam_review_post_class"]):
+
+        # ignore invalid elements 
+        if (game_review is None):
+            continue 
+
+        content = game_review.find(
+            class_ = steam_scraper_config["steam_review_text_class"]
+        )
+
+        # ignore invalid elements 
+        if (content is None):
+            continue 
+
+        content = content.contents
+
+        # concatenate children strings of this element 
+        content = "".join(child.strip() for child in content if isinstance(child, str))
+        
+        # whether user recommends target game { "Recommended", "Not Recommended" }
+        voting = game_review.find(class_ = steam_scraper_config["steam_review_vote_class"]).text
+
+        review_posts.append((voting, content))
+
+    return review_posts 
 
 class GamesReviewScraper:
 
@@ -77,68 +112,61 @@ class GamesReviewScraper:
         return self._to_review_links(self._scrape_chart_games())
 
     def _scrape_game_reviews(self, game_link : str) -> List[ Tuple[ str, str ] ]:
+        review_buffer = ReviewBuffer()
+        self._scrape_game_reviews_into(game_link, review_buffer)
+        return review_buffer.reviews 
+
+    def _scrape_game_reviews_into(self, game_link : str, review_sink : Union[ ReviewSink, ReviewBuffer ]) -> None:
         
         print(f"[ Scraping ] [ {game_link} ]")
 
+        # resumed game already complete (or finished by an earlier run) 
+        if (review_sink.finished) or (review_sink.num_reviews >= self.steam_scraper_config["steam_review_minimum_quantity"]):
+            return 
+
         def scroll_to_load() -> None:
             self.webdriver.execute_script("window.scrollTo(0, document.body.scrollHeight * 0.75);")
             time.sleep(1.02)
             self.webdriver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
 
-        try:
-
-            # timeout if page fails to load within specified period 
-            self.webdriver.set_page_load_timeout(self.steam_scraper_config["steam_connect_timeout"])
-            
-            # fetch content from game review page (with HTTP/GET)
-            self.webdriver.get(game_link)
+        # timeout if page fails to load within specified period ("TimeoutException" fails the job, which resumes from its checkpoint later)
+        self.webdriver.set_page_load_timeout(self.steam_scraper_config["steam_connect_timeout"])
         
-        except (TimeoutException):
-
-            # return empty list upon timeout 
-            return []
+        # fetch content from game review page (with HTTP/GET)
+        self.webdriver.get(game_link)
 
-        def find_number_of_views():
-            nonlocal num_reviews_found, should_keep_counting, page_content 
+        def collect_new_review_posts() -> None:
+            nonlocal num_cards_parsed 
 
-            # update reviews # until reaching certain quantity 
-            while (should_keep_counting):
-
-                # wait until page content is loaded 
-                if (page_content is not None):
+            # only the cards appended since the previous call leave the browser and get parsed 
+            new_review_cards = self.webdriver.execute_script(
+                NEW_REVIEW_CARDS_SCRIPT, self.steam_scraper_config["steam_review_post_class"], num_cards_parsed
+            )
 
-                    # track number of review posts 
-                    num_reviews_found = len(BeautifulSoup(page_content, "lxml").find_all(
-                        class_ = self.steam_scraper_config["steam_review_post_class"])
-                    )
+            num_cards_parsed += len(new_review_cards)
 
-                time.sleep(1.00)
+            # duplicates (including reviews kept from an interrupted run) are ignored by the sink 
+            for voting, content in parse_review_posts("".join(new_review_cards), self.steam_scraper_config):
+                review_sink.append(voting, content)
 
-        # number of reviews discovered 
-        num_reviews_found = 0
+            # appended reviews become durable 
+            review_sink.checkpoint()
 
-        # number of reviews previously discovered 
-        prev_num_reviews = 0
+        # number of review cards already parsed (cards are only ever appended) 
+        num_cards_parsed = 0 
 
-        should_keep_counting = True 
+        # number of review cards previously discovered (re-scrolling past reviews kept from an interrupted run is progress too) 
+        prev_num_cards = 0
 
-        # timestamp when "prev_num_reviews" was recorded 
+        # timestamp when "prev_num_cards" was recorded 
         sot = datetime.datetime.now()
 
-        # content found on webpage 
-        page_content = None 
-
-        # thread responsible for tracking number of reviews 
-        thread = threading.Thread(target = find_number_of_views)
-
-        thread.start()
-
-        while (num_reviews_found < self.steam_scraper_config["steam_review_minimum_quantity"]):
+        while (review_sink.num_reviews < self.steam_scraper_config["steam_review_minimum_quantity"]):
 
             # load content by scrolling down 
             scroll_to_load()
 
-            page_content = self.webdriver.page_source
+            collect_new_review_posts()
 
             # load more content if button visible
             if (self.webdriver.find_element(By.ID, "GetMoreContentBtn").is_displayed()):
@@ -146,63 +174,22 @@ class GamesReviewScraper:
 
             # terminate searching after review # remained over certain duration 
             if ((datetime.datetime.now() - sot).total_seconds() >= self.steam_scraper_config["steam_review_load_timeout"]):
-                if (num_reviews_found == prev_num_reviews):
+                if (num_cards_parsed == prev_num_cards):
                     break 
-                prev_num_reviews = num_reviews_found 
+                prev_num_cards = num_cards_parsed
                 sot = datetime.datetime.now()
 
-            sys.stdout.write(f"\r[ Discovered ] [ {num_reviews_found} ]")
+            sys.stdout.write(f"\r[ Discovered ] [ {review_sink.num_reviews} ]")
             sys.stdout.flush()
 
             time.sleep(1.00)
-                    
-        should_keep_counting = False 
-
-        sys.stdout.write(f"\r< {num_reviews_found} Reviews Discovered >")
-
-        print("\n")
-
-        thread.join()
-
-        game_review_elements = BeautifulSoup(page_content, "lxml").find_all(
-            class_ = self.steam_scraper_config["steam_review_post_class"]
-        )
-
-        scraped_contents = []
-
-        scraped_votings = []
-
-        for game_review in game_review_elements:
-
-            # ignore invalid elements 
-            if (game_review is None):
-                continue 
-
-            content = game_review.find(
-                class_ = self.steam_scraper_config["steam_review_text_class"]
-            )
-
-            # ignore invalid elements 
-            if (content is None):
-                continue 
-
-            content = content.contents
-
-            # concatenate children strings of this element 
-            content = "".join(child.strip() for child in content if isinstance(child, str))
-            
-            # whether user recommends target game { "Recommended", "Not Recommended" }
-            voting = game_review.find(class_ = self.steam_scraper_config["steam_review_vote_class"]).text
 
-            # ignore duplicate reviews 
-            if (content in scraped_contents):
-                continue 
+        # cards appended during the last pause 
+        collect_new_review_posts()
 
-            scraped_contents.append(content)
-            
-            scraped_votings.append(voting)
+        sys.stdout.write(f"\r< {review_sink.num_reviews} Reviews Discovered >")
 
-        return list(zip(scraped_votings, scraped_contents))
+        print("\n")
 
     @staticmethod 
     def save_result_to_csv(filename : str, scrape_content : List[ Tuple[ str, str ] ], *args, **kwargs) -> bool:
@@ -232,6 +219,304 @@ class GamesReviewScraper:
             # signal failure to save file 
             return False 
 
+class RateLimiter:
+
+    # spaces request starts at least 1 / "requests_per_second" apart for every coroutine sharing it 
+    def __init__(self, requests_per_second : float) -> None:
+        self.interval = ((1 / requests_per_second) if (requests_per_second > 0) else (0))
+        self.next_time = 0.0 
+
+    async def acquire(self) -> None:
+        now = asyncio.get_running_loop().time()
+        wait_time = self.next_time - now 
+        self.next_time = max(now, self.next_time) + self.interval 
+        if (wait_time > 0):
+            await asyncio.sleep(wait_time)
+
+class HttpGamesReviewScraper:
+
+    # fetches numbered review pages over plain HTTP instead of scrolling a browser (use as "async with")
+    # scrapers of one event loop should share "rate_limiter" so that the configured rate bounds all of them together 
+    def __init__(self, steam_scraper_config : Dict[ str, Any ], rate_limiter : Optional[ RateLimiter ] = None) -> None:
+        self.steam_scraper_config = steam_scraper_config 
+        self.rate_limiter = ((rate_limiter) if (rate_limiter is not None) else (RateLimiter(steam_scraper_config.get("steam_http_requests_per_second", 4))))
+        self.session = None 
+
+    async def __aenter__(self) -> "HttpGamesReviewScraper":
+        max_connections = self.steam_scraper_config.get("steam_http_max_connections", 8)
+        self.session = aiohttp.ClientSession(
+            connector = aiohttp.TCPConnector(limit = max_connections, limit_per_host = max_connections),
+            timeout = aiohttp.ClientTimeout(total = self.steam_scraper_config["steam_connect_timeout"])
+        )
+        return self 
+
+    async def __aexit__(self, *exc_info) -> bool:
+        await self.session.close()
+        return False 
+
+    def _page_link(self, game_link : str, page_idx : int) -> str:
+        # "https://ABC.com/app/123/positivereviews/?p=1&..." => "...?p=<page_idx>&..."
+        url = urllib.parse.urlsplit(game_link)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        query[self.steam_scraper_config.get("steam_review_page_parameter", "p")] = str(page_idx)
+        return urllib.parse.urlunsplit(url._replace(query = urllib.parse.urlencode(query)))
+
+    async def _fetch_page(self, page_link : str) -> str:
+
+        # a page that cannot be fetched raises, so a truncated game is failed (and resumed later) instead of completed 
+        status = None 
+
+        for attempt_idx in range(self.steam_scraper_config.get("steam_http_max_retries", 3) + 1):
+
+            await self.rate_limiter.acquire()
+
+            try:
+
+                async with self.session.get(page_link) as response:
+
+                    if (response.status == 200):
+                        return await response.text()
+
+                    status = response.status 
+
+                    # only throttling and server errors are worth retrying 
+                    if (status not in (429, 500, 502, 503, 504)):
+                        break 
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exception:
+                status = repr(exception)
+
+            await asyncio.sleep(2 ** attempt_idx)
+
+        raise ConnectionError(f"Failed to fetch {page_link} ({status})")
+
+    async def scrape_game_reviews(self, game_link : str) -> List[ Tuple[ str, str ] ]:
+        review_buffer = ReviewBuffer()
+        await self.scrape_game_reviews_into(game_link, review_buffer)
+        return review_buffer.reviews 
+
+    async def scrape_game_reviews_into(self, game_link : str, review_sink : Union[ ReviewSink, ReviewBuffer ]) -> None:
+
+        print(f"[ Scraping ] [ {game_link} ]")
+
+        minimum_quantity = self.steam_scraper_config["steam_review_minimum_quantity"]
+
+        # finished by an earlier run 
+        if (review_sink.finished):
+            return 
+
+        # pages requested concurrently per round 
+        num_concurrent_pages = self.steam_scraper_config.get("steam_http_max_connections", 8)
+
+        # an interrupted game continues from the first page of its unfinished round 
+        page_idx = review_sink.cursor or 1 
+
+        while (review_sink.num_reviews < minimum_quantity):
+
+            page_contents = await asyncio.gather(*(
+                self._fetch_page(self._page_link(game_link, page_idx + page_offset)) for page_offset in range(num_concurrent_pages)
+            ), return_exceptions = True)
+
+            # the round is not checkpointed, so a retry of the job fetches it again 
+            for page_content in page_contents:
+                if (isinstance(page_content, BaseException)):
+                    raise page_content 
+
+            page_idx += num_concurrent_pages 
+
+            num_reviews_scraped = review_sink.num_reviews 
+
+            for page_content in page_contents:
+
+                # duplicates are ignored by the sink 
+                for voting, content in parse_review_posts(page_content, self.steam_scraper_config):
+                    if (review_sink.num_reviews < minimum_quantity):
+                        review_sink.append(voting, content)
+
+            review_sink.checkpoint(page_idx)
+
+            sys.stdout.write(f"\r[ Discovered ] [ {review_sink.num_reviews} ]")
+            sys.stdout.flush()
+
+            # pages past the last one are empty (or repeat it); every page of the round was fetched 
+            if (review_sink.num_reviews == num_reviews_scraped):
+                break 
+
+        sys.stdout.write(f"\r< {review_sink.num_reviews} Reviews Discovered >")
+
+        print("\n")
+
+    async def scrape_many_game_reviews(self, game_links : List[ str ]) -> List[ List[ Tuple[ str, str ] ] ]:
+        # games share the connection pool and the rate limiter 
+        return await asyncio.gather(*(self.scrape_game_reviews(game_link) for game_link in game_links))
+
+    save_result_to_csv = staticmethod(GamesReviewScraper.save_result_to_csv)
+
+def render_fixture_page(review_posts : List[ Tuple[ str, str ] ], steam_scraper_config : Dict[ str, Any ]) -> str:
+    # mimics the markup of a review card closely enough for "parse_review_posts" 
+    return "<html><body>{}</body></html>".format("".join(
+        "<div class=\"apphub_Card {0}\"><div class=\"{1}\">{3}</div><div class=\"{2}\"><div class=\"date_posted\">Posted: 1 January</div>{4}</div></div>".format(
+            steam_scraper_config["steam_review_post_class"], steam_scraper_config["steam_review_vote_class"], steam_scraper_config["steam_review_text_class"],
+            html.escape(voting), html.escape(content)
+        ) for voting, content in review_posts
+    ))
+
+async def start_fixture_server(fixture_pages : List[ str ], host : Optional[ str ] = "127.0.0.1", port : Optional[ int ] = 8765) -> aiohttp.web.AppRunner:
+    # local stand-in for the review pages: "?p=<n>" serves "fixture_pages[n - 1]", later pages are empty 
+
+    async def serve_page(request : aiohttp.web.Request) -> aiohttp.web.Response:
+        page_idx = int(request.query.get("p", 1))
+        page_content = ((fixture_pages[page_idx - 1]) if (1 <= page_idx <= len(fixture_pages)) else ("<html><body></body></html>"))
+        return aiohttp.web.Response(text = page_content, content_type = "text/html")
+
+    application = aiohttp.web.Application()
+    application.router.add_get("/{tail:.*}", serve_page)
+    runner = aiohttp.web.AppRunner(application)
+    await runner.setup()
+    await aiohttp.web.TCPSite(runner, host, port).start()
+    return runner 
+
+def open_job_queue(queue_filename : str, steam_scraper_config : Dict[ str, Any ]) -> ScrapeJobQueue:
+    return ScrapeJobQueue(queue_filename, 
+        max_attempts    = steam_scraper_config.get("steam_job_max_attempts", 5),
+        backoff_seconds = steam_scraper_config.get("steam_job_backoff_seconds", 30),
+        lease_seconds   = steam_scraper_config.get("steam_job_lease_seconds", 3600)
+    )
+
+def open_review_sink(result_folder : str, job_queue : ScrapeJobQueue, job_id : int, claim_token : str, steam_scraper_config : Dict[ str, Any ]) -> ReviewSink:
+    # job ids follow the order of enqueueing ( "result_0.csv" is the first review link ); a retried job resumes its checkpoint 
+    # every checkpoint doubles as the heartbeat of the job, so slow games keep their lease 
+    output_format = steam_scraper_config.get("steam_output_format", "csv")
+    return ReviewSink(
+        os.path.join(result_folder, f"result_{job_id - 1}.{output_format}"), steam_scraper_config.get("steam_output_batch_size", 500),
+        heartbeat = JobLease(job_queue, job_id, claim_token).renew
+    )
+
+def wait_for_job(job_queue : ScrapeJobQueue) -> Union[ float, None ]:
+    # seconds until a job may become available, "None" once the queue is finished 
+    next_available_time = job_queue.next_available_time()
+    if (next_available_time is None):
+        return None 
+    return min(max(next_available_time - time.time(), 1.0), 30.0)
+
+def run_selenium_worker(queue_filename : str, result_folder : str, steam_scraper_config : Dict[ str, Any ]) -> None:
+
+    job_queue = open_job_queue(queue_filename, steam_scraper_config)
+
+    # browser reused across jobs, rebuilt only after a failure 
+    scraper = None 
+
+    while True:
+
+        job = job_queue.claim()
+
+        if (job is None):
+            wait_time = wait_for_job(job_queue)
+            if (wait_time is None):
+                break 
+            time.sleep(wait_time)
+            continue 
+
+        job_id, url, attempt_idx, claim_token = job 
+
+        try:
+
+            if (scraper is None):
+                scraper = GamesReviewScraper(steam_scraper_config)
+
+            review_sink = open_review_sink(result_folder, job_queue, job_id, claim_token, steam_scraper_config)
+
+            # scrape specified number of reviews, appended to the output as they are discovered 
+            scraper._scrape_game_reviews_into(url, review_sink)
+
+            if not (review_sink.close()):
+                raise OSError(f"No reviews scraped: {url}")
+
+            job_queue.complete(job_id, claim_token)
+
+        except (Exception) as exception:
+
+            print(f"[ Failed ] [ Attempt #{attempt_idx} ] [ {url} ] {exception!r}")
+
+            job_queue.fail(job_id, claim_token, repr(exception))
+
+            if (scraper is not None):
+                try:
+                    scraper.webdriver.quit()
+                except (Exception):
+                    pass 
+                scraper = None 
+
+    if (scraper is not None):
+        scraper.webdriver.quit()
+
+    job_queue.close()
+
+async def run_http_worker(queue_filename : str, result_folder : str, steam_scraper_config : Dict[ str, Any ], rate_limiter : Optional[ RateLimiter ] = None) -> None:
+
+    job_queue = open_job_queue(queue_filename, steam_scraper_config)
+
+    # session reused across jobs 
+    async with HttpGamesReviewScraper(steam_scraper_config, rate_limiter) as scraper:
+
+        while True:
+
+            job = job_queue.claim()
+
+            if (job is None):
+                wait_time = wait_for_job(job_queue)
+                if (wait_time is None):
+                    break 
+                await asyncio.sleep(wait_time)
+                continue 
+
+            job_id, url, attempt_idx, claim_token = job 
+
+            try:
+
+                review_sink = open_review_sink(result_folder, job_queue, job_id, claim_token, steam_scraper_config)
+
+                await scraper.scrape_game_reviews_into(url, review_sink)
+
+                if not (review_sink.close()):
+                    raise OSError(f"No reviews scraped: {url}")
+
+                job_queue.complete(job_id, claim_token)
+
+            except (Exception) as exception:
+
+                print(f"[ Failed ] [ Attempt #{attempt_idx} ] [ {url} ] {exception!r}")
+
+                job_queue.fail(job_id, claim_token, repr(exception))
+
+    job_queue.close()
+
+def run_scraper_workers(queue_filename : str, result_folder : str, steam_scraper_config : Dict[ str, Any ], num_workers : Optional[ int ] = 1, engine : Optional[ str ] = "selenium") -> None:
+
+    assert (engine in ("selenium", "http"))
+
+    if (engine == "http"):
+
+        # coroutines of one event loop, each with its own session but one rate limit for all of them 
+        async def run_http_workers() -> None:
+            rate_limiter = RateLimiter(steam_scraper_config.get("steam_http_requests_per_second", 4))
+            await asyncio.gather(*(run_http_worker(queue_filename, result_folder, steam_scraper_config, rate_limiter) for _ in range(num_workers)))
+
+        asyncio.run(run_http_workers())
+
+        return 
+
+    # one browser per thread (the drivers do the heavy lifting in their own processes)
+    workers = [
+        threading.Thread(target = run_selenium_worker, args = (queue_filename, result_folder, steam_scraper_config)) for _ in range(num_workers)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
 if (__name__ == "__main__"):
 
     test = 1
@@ -254,38 +539,69 @@ if (__name__ == "__main__"):
             "steam_review_minimum_quantity" : 10000,
             "steam_review_load_timeout" : 20,
             "steam_chart_num_games" : 200,
-            "steam_connect_timeout" : 15
+            "steam_connect_timeout" : 15,
+            "steam_job_max_attempts" : 5,
+            "steam_job_backoff_seconds" : 30,
+            "steam_job_lease_seconds" : 3600,
+            "steam_output_format" : "csv", # csv / jsonl / parquet
+            "steam_output_batch_size" : 500
         }
 
-        while True:
+        # review links with their state, attempt # and backoff (survives crashes and restarts)
+        queue_filename = os.path.join(os.path.dirname(__file__), "reviews_jobs.sqlite")
 
-            try:
+        num_workers = 4 
 
-                # initialization
-                scraper = GamesReviewScraper(steam_scraper_config)
+        engine = "selenium" # selenium / http
 
-                num_links_scraped = len(os.listdir(result_folder))
+        job_queue = open_job_queue(queue_filename, steam_scraper_config)
 
-                print(f"Already Scraped: {num_links_scraped}")
-                
-                if (steam_scraper_config["steam_chart_num_games"] <= num_links_scraped):
-                    break 
+        if (sum(job_queue.counts().values()) < steam_scraper_config["steam_chart_num_games"]):
+
+            scraper = GamesReviewScraper(steam_scraper_config)
 
-                # scrape review links for various games 
-                for url_idx, url in enumerate(scraper.scrape_review_links()):
-                    
-                    if (url_idx < num_links_scraped):
-                        continue 
+            # scrape review links for various games 
+            job_queue.enqueue(scraper.scrape_review_links()[ : steam_scraper_config["steam_chart_num_games"] ])
 
-                    # scrape specified number of reviews and save as ".csv"
-                    while not (scraper.save_result_to_csv(os.path.join(result_folder, f"result_{url_idx}.csv"), 
-                        scraper._scrape_game_reviews(url), encoding = "utf-8", index = False
-                    )):
-                        print(f"Error saving content: {url}")
-                        time.sleep(30)
+            scraper.webdriver.quit()
 
-            except:
+        print(f"Jobs: {job_queue.counts()}")
+
+        run_scraper_workers(queue_filename, result_folder, steam_scraper_config, num_workers, engine)
+
+        print(f"Jobs: {job_queue.counts()}")
+
+    if (test == 2):
+
+        # HTTP engine against a local stand-in serving fixture pages 
+        steam_scraper_config = {
+            "steam_review_link_format" : "http://127.0.0.1:8765/app/{}/{}reviews/?p=1&browsefilter=toprated",
+            "steam_review_text_class" : "apphub_CardTextContent",
+            "steam_review_post_class" : "modalContentLink",
+            "steam_review_vote_class" : "title",
+            "steam_review_minimum_quantity" : 10000,
+            "steam_connect_timeout" : 15,
+            "steam_http_max_connections" : 4,
+            "steam_http_requests_per_second" : 50,
+            "steam_http_max_retries" : 1
+        }
+
+        fixture_reviews = [
+            (("Recommended") if (review_idx % 3) else ("Not Recommended"), f"Review #{review_idx} & <more>") for review_idx in range(95)
+        ]
+
+        async def scrape_fixture_pages() -> List[ List[ Tuple[ str, str ] ] ]:
+            runner = await start_fixture_server([
+                render_fixture_page(fixture_reviews[ page_start : page_start + 10 ], steam_scraper_config) for page_start in range(0, len(fixture_reviews), 10)
+            ])
+            try:
+                async with HttpGamesReviewScraper(steam_scraper_config) as scraper:
+                    return await scraper.scrape_many_game_reviews([
+                        steam_scraper_config["steam_review_link_format"].format(123, sentiment) for sentiment in ("positive", "negative")
+                    ])
+            finally:
+                await runner.cleanup()
 
-                del scraper 
+        assert all(scraped_reviews == fixture_reviews for scraped_reviews in asyncio.run(scrape_fixture_pages()))
 
-                time.sleep(60)
\ No newline at end of file
+        print("< Fixture Pages Scraped >")
@@ -0,0 +1,39 @@
+import zipfile, os
+import pytest
+
+pytest.importorskip("gensim")
+
+from corpus_io import list_csv_sources, list_token_sources
+from word_embed import DF2PKL
+import tokenizer
+
+class _SplittingChain:
+
+    # stands in for "TokenizationChain" (no corpora needed): whitespace tokens
+    def __init__(self, *chain_args) -> None:
+        self.lemmatizer = self
+
+    def cache_statistics(self) -> dict:
+        return {  "hits" : 0, "misses" : 0  }
+
+    def tokenize_batch(self, texts : list) -> list:
+        return [  text.split() for text in texts  ]
+
+def test_zip_members_tokenize_into_readable_token_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokenizer, "TokenizationChain", _SplittingChain)
+    archive_filename = str(tmp_path / "batch_test.zip")
+    with zipfile.ZipFile(archive_filename, "w") as archive:
+        archive.writestr("result_0.csv", "content\nfirst review text\n")
+        archive.writestr("a/result_1.csv", "content\nsecond review\n")
+        archive.writestr("b/result_1.csv", "content\nthird one\n")
+    output_folder = str(tmp_path / "batch_test_tokenized")
+    os.makedirs(output_folder)
+
+    tokenizer.tokenize_dataframe_files(list_csv_sources(archive_filename), output_folder, ([], "", ""), "content", 0, verbose = False)
+
+    # member names, not "batch_test.zip::...", and equal base names in different directories kept apart
+    assert sorted(os.listdir(output_folder)) == [ "a__result_1.csv", "b__result_1.csv", "result_0.csv" ]
+    assert all(os.path.isfile(source) for source in list_token_sources(output_folder))
+    assert sorted(DF2PKL.load_dataframe_tokens_from_folders([ output_folder ], "content", verbose = False)) == sorted([
+        [ "first", "review", "text" ], [ "second", "review" ], [ "third", "one" ]
+    ])
@@ -0,0 +1,47 @@
+import os
+import pytest
+
+from review_sink import ReviewSink
+from corpus_io import pyarrow
+
+FORMATS = [ "csv", "jsonl" ] + ([ "parquet" ] if (pyarrow is not None) else [])
+
+def _reviews(num_reviews : int, offset : int = 0) -> list:
+    return [  ("Recommended", f"review #{review_idx}") for review_idx in range(offset, offset + num_reviews)  ]
+
+def _read_bytes(filename : str) -> bytes:
+    with open(filename, "rb") as rf:
+        return rf.read()
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_resume_after_close_keeps_the_finished_output(tmp_path, output_format):
+    filename = str(tmp_path / f"result_0.{output_format}")
+    review_sink = ReviewSink(filename, batch_size = 3)
+    for voting, content in _reviews(7):
+        review_sink.append(voting, content)
+    assert review_sink.close()
+    finished_output = _read_bytes(filename)
+
+    resumed_sink = ReviewSink(filename, batch_size = 3)
+    assert resumed_sink.finished
+    assert (resumed_sink.num_reviews == 7)
+    assert not (resumed_sink.append("Recommended", "review #100"))
+    assert resumed_sink.close()
+    assert (_read_bytes(filename) == finished_output)
+    assert not (os.path.exists(filename + ".checkpoint.json"))
+
+@pytest.mark.parametrize("output_format", FORMATS)
+def test_resume_before_close_continues_from_the_checkpoint(tmp_path, output_format):
+    filename = str(tmp_path / f"result_0.{output_format}")
+    review_sink = ReviewSink(filename, batch_size = 3)
+    for voting, content in _reviews(7):
+        review_sink.append(voting, content)
+    # crash : the last review was never checkpointed 
+
+    resumed_sink = ReviewSink(filename, batch_size = 3)
+    assert not (resumed_sink.finished)
+    assert (resumed_sink.num_reviews == 6)
+    for voting, content in _reviews(5, offset = 4):
+        resumed_sink.append(voting, content)
+    assert resumed_sink.close()
+    assert (ReviewSink(filename).num_reviews == 9)
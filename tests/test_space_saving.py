@@ -0,0 +1,43 @@
+import collections, random
+
+from analyze_new_words import SpaceSavingCounter
+
+def _zipf_tokens(random_generator : random.Random, num_tokens : int, vocabulary_size : int) -> list:
+    weights = [  1 / (rank + 1) for rank in range(vocabulary_size)  ]
+    return random_generator.choices([  f"token_{rank}" for rank in range(vocabulary_size)  ], weights = weights, k = num_tokens)
+
+def _assert_bounds(counter : SpaceSavingCounter, true_counts : collections.Counter) -> None:
+    assert (len(counter.counts) <= counter.capacity)
+    assert (counter.total == sum(true_counts.values()))
+    for token, true_count in true_counts.items():
+        if (token in counter.counts):
+            assert (counter.counts[token] - counter.errors[token] <= true_count <= counter.counts[token])
+        else:
+            assert (true_count <= counter.floor)
+
+def test_merged_shard_summaries_keep_the_overestimate_bound():
+    random_generator = random.Random(0)
+    shards = [  _zipf_tokens(random_generator, 5000, 2000) for _ in range(6)  ]
+    true_counts = collections.Counter(token for shard in shards for token in shard)
+    summaries = []
+    for shard in shards:
+        shard_counter = SpaceSavingCounter(100)
+        shard_counter.update(shard)
+        summaries.append(shard_counter.summary())
+    for order in (list(range(len(shards))), list(reversed(range(len(shards)))), [ 3, 0, 5, 1, 4, 2 ]):
+        merged_counter = SpaceSavingCounter(100)
+        for shard_idx in order:
+            merged_counter.merge(summaries[shard_idx])
+        _assert_bounds(merged_counter, true_counts)
+        # the heaviest tokens survive every merge order 
+        assert all(token in merged_counter.counts for token, _ in true_counts.most_common(5))
+
+def test_streaming_after_merge_keeps_the_overestimate_bound():
+    random_generator = random.Random(1)
+    first_shard, second_shard = _zipf_tokens(random_generator, 3000, 1000), _zipf_tokens(random_generator, 3000, 1000)
+    shard_counter = SpaceSavingCounter(50)
+    shard_counter.update(first_shard)
+    merged_counter = SpaceSavingCounter(50)
+    merged_counter.merge(shard_counter.summary())
+    merged_counter.update(second_shard)
+    _assert_bounds(merged_counter, collections.Counter(first_shard + second_shard))
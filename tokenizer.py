@@ -1,7 +1,165 @@
-from nlp_utils import remove_symbols, CustomWordSet, StopWordRemover, DefaultVocabularySet, BasicStringTokenizer, LetterCaseOptimizer, TokensTaggingLemmatizer
-import pandas, sys, os
+from nlp_utils import download_corpora, remove_symbols, CustomWordSet, StopWordRemover, DefaultVocabularySet, BasicStringTokenizer, LetterCaseOptimizer, TokensTaggingLemmatizer, Pipeline
+from processing_manifest import ProcessingManifest, file_digest, files_stat_digest
+from pipeline_metrics import metrics
+from corpus_io import list_csv_sources, iterate_csv_sources, source_output_name, strip_archive_suffix, write_parquet_tokens
+import multiprocessing, collections, sys, os
 from typing import *
 
+class TokenizationChain:
+
+    def __init__(self, custom_dictionaries      : List[ str ],
+                       stopword_filename        : str,
+                       token_regular_expression : str,
+                       vocabulary_snapshot      : Optional[ str ] = None) -> None:
+        DefaultVocabularySet.initialize(vocabulary_snapshot)
+        self.tokenizer = BasicStringTokenizer(token_regular_expression)
+        self.case_optimizer = self.load_case_optimizer(custom_dictionaries, vocabulary_snapshot)
+        self.lemmatizer = TokensTaggingLemmatizer()
+        self.stopword_filter = StopWordRemover(CustomWordSet(stopword_filename))
+        self.pipeline = Pipeline([
+            self.tokenizer, remove_symbols, self.case_optimizer, self.lemmatizer, self.stopword_filter
+        ])
+
+    @staticmethod 
+    def load_case_optimizer(custom_dictionaries : List[ str ], vocabulary_snapshot : Optional[ str ] = None) -> LetterCaseOptimizer:
+        # compiled once next to the snapshot; later chains (every pool worker) load it instead of decoding the tables 
+        def build_dictionary() -> Set[ str ]:
+            custom_words = set().union(
+                *(CustomWordSet(filename)
+                    for filename in custom_dictionaries)
+            )
+            return custom_words.union(
+                DefaultVocabularySet.stopwords,
+                DefaultVocabularySet.wordnet,
+                DefaultVocabularySet.words,
+                DefaultVocabularySet.names,
+            )
+        if (vocabulary_snapshot is None):
+            return LetterCaseOptimizer(build_dictionary())
+        return LetterCaseOptimizer.load_or_compile(
+            os.path.splitext(vocabulary_snapshot)[0] + ".tokenizer.case_optimizer",
+            files_stat_digest([ vocabulary_snapshot ] + list(custom_dictionaries)), build_dictionary
+        )
+
+    def tokenize(self, text : str) -> List[ str ]:
+        return self.pipeline(text)
+
+    def tokenize_batch(self, texts : List[ str ]) -> List[ List[ str ] ]:
+        return self.pipeline.run(texts)
+
+# chain owned by the current (worker) process, built once by "initialize_worker"
+_worker_chain = None
+
+# pool workers hand their stage metrics back with every shard
+_worker_reports_metrics = False
+
+def initialize_worker(chain_args : Tuple[ List[ str ], str, str, Optional[ str ] ], enable_metrics : Optional[ bool ] = False, report_metrics : Optional[ bool ] = False) -> None:
+    global _worker_chain, _worker_reports_metrics
+    metrics.enabled = enable_metrics
+    _worker_reports_metrics = (enable_metrics and report_metrics)
+    _worker_chain = TokenizationChain(*chain_args)
+    # registered for the chain the process owns (replacing the one it supersedes), not by every lemmatizer ever built
+    metrics.register_cache("lemmatization", _worker_chain.lemmatizer.cache_statistics)
+
+def tokenize_shard(texts : List[ str ]) -> Tuple[ List[ List[ str ] ], int, Union[ Dict[ str, Any ], None ] ]:
+    tokens_list = _worker_chain.tokenize_batch(texts)
+    return (tokens_list, os.getpid(), ((metrics.drain()) if (_worker_reports_metrics) else (None)))
+
+class _CompletedShard:
+
+    def __init__(self, value : Any) -> None:
+        self.value = value
+
+    def get(self) -> Any:
+        return self.value
+
+def tokenize_dataframe_files(files_in_folder  : List[ str ],
+                             output_folder    : str,
+                             chain_args       : Tuple[ List[ str ], str, str, Optional[ str ] ],
+                             column_name      : str,
+                             min_tokens       : int,
+                             num_workers      : Optional[ int  ] = 1,
+                             shard_rows       : Optional[ int  ] = 2000,
+                             encoding         : Optional[ str  ] = "utf-8",
+                             error_bad_lines  : Optional[ bool ] = False,
+                             verbose          : Optional[ bool ] = True,
+                             output_format    : Optional[ str  ] = "csv",
+                             enable_metrics   : Optional[ bool ] = False,
+                             on_file_complete : Optional[ Callable[ [ str, str ], None ] ] = None) -> None:
+
+    assert (output_format in ("csv", "parquet"))
+
+    def generate_shards() -> Iterator[ Tuple[ int, int, bool, List[ str ] ] ]:
+        # archive members are read in archive order, in one pass over the archive
+        file_indices = {  filename : file_idx for file_idx, filename in enumerate(files_in_folder)  }
+        for filename, dataframe in iterate_csv_sources(files_in_folder, encoding = encoding, error_bad_lines = error_bad_lines):
+            file_idx = file_indices[filename]
+            dataframes[file_idx] = dataframe
+            texts = [  str(text) for text in dataframe[column_name].tolist()  ]
+            starts = list(range(0, len(texts), shard_rows)) or [ 0 ]
+            for start in starts:
+                yield (file_idx, start + shard_rows, start == starts[-1], texts[ start : start + shard_rows ])
+
+    def complete_shard(file_idx : int, stop : int, is_last : bool, shard_result : Tuple[ List[ List[ str ] ], int, Union[ Dict[ str, Any ], None ] ]) -> None:
+        tokens_list, worker_pid, worker_metrics = shard_result
+        if (worker_metrics is not None):
+            metrics.merge(worker_metrics, source = f"@{worker_pid}")
+        file_tokens[file_idx].extend(tokens_list)
+        if (verbose):
+            sys.stdout.write("\rTokenizing #{0}: {1:.1f}%".format(file_idx, min(stop / max(len(dataframes[file_idx]), 1), 1) * 100))
+            sys.stdout.flush()
+        if not (is_last):
+            return
+        dataframe = dataframes.pop(file_idx)
+        tokens_list = file_tokens.pop(file_idx)
+        dataframe[column_name] = ((tokens_list) if (output_format == "parquet") else ([  str(tokens) for tokens in tokens_list  ]))
+        dataframe = dataframe[[  len(tokens) >= min_tokens for tokens in tokens_list  ]]
+        output_filename = os.path.join(output_folder, os.path.splitext(source_output_name(files_in_folder[file_idx]))[0] + "." + output_format)
+        if (output_format == "parquet"):
+            write_parquet_tokens(output_filename, dataframe)
+        else:
+            dataframe.to_csv(output_filename, encoding = encoding, index = False)
+        # output of a previous run in the other format would be read as a second copy of the file
+        for stale_format in ("csv", "parquet"):
+            stale_filename = os.path.splitext(output_filename)[0] + "." + stale_format
+            if (stale_format != output_format) and (os.path.exists(stale_filename)):
+                os.remove(stale_filename)
+        if (on_file_complete is not None):
+            on_file_complete(files_in_folder[file_idx], output_filename)
+        if (verbose):
+            print("")
+
+    dataframes  = dict()
+    file_tokens = collections.defaultdict(list)
+
+    # serial mode runs the exact same chain inside the current process
+    pool = None
+    if (num_workers > 1):
+        metrics.enabled = enable_metrics
+        pool = multiprocessing.Pool(num_workers, initializer = initialize_worker, initargs = (chain_args, enable_metrics, True))
+    else:
+        initialize_worker(chain_args, enable_metrics)
+
+    # bounded window of in-flight shards, consumed in submission order (deterministic output)
+    max_pending = max(num_workers, 1) * 4
+    pending = collections.deque()
+    try:
+        for file_idx, stop, is_last, texts in generate_shards():
+            if (pool is None):
+                pending.append((file_idx, stop, is_last, _CompletedShard(tokenize_shard(texts))))
+            else:
+                pending.append((file_idx, stop, is_last, pool.apply_async(tokenize_shard, (texts,))))
+            while (len(pending) > max_pending):
+                file_idx, stop, is_last, result = pending.popleft()
+                complete_shard(file_idx, stop, is_last, result.get())
+        while (pending):
+            file_idx, stop, is_last, result = pending.popleft()
+            complete_shard(file_idx, stop, is_last, result.get())
+    finally:
+        if (pool is not None):
+            pool.close()
+            pool.join()
+
 if (__name__ == "__main__"):
 
 
@@ -12,79 +170,72 @@ if (__name__ == "__main__"):
         os.path.join(os.path.dirname(__file__), "dictionary/custom_words_sent.txt")
     ]
 
-    training_data_folder     = os.path.join(os.path.dirname(__file__), "news") # reviews / news 
+    training_data_folder     = os.path.join(os.path.dirname(__file__), "news") # reviews / news (folder or ".zip" / ".tar.gz" archive)
 
     stopword_filename        = os.path.join(os.path.dirname(__file__), "dictionary/custom_stopwords.txt")
 
+    vocabulary_snapshot      = os.path.join(os.path.dirname(__file__), "dictionary/default_vocabulary.snapshot")
+
     token_regular_expression = "[a-zA-Z0-9\']+"
     
     dataframe_column_name    = "content"
 
     min_tokens               = 10
 
-    # << PARAMETERS 
-
-
-    DefaultVocabularySet.initialize()
-
-    training_data_output_folder = training_data_folder + "_tokenized"
-
-    if not (os.path.exists(training_data_output_folder)):
-        os.makedirs(training_data_output_folder)
-
-    custom_dictionaries = set().union(
-        *(CustomWordSet(filename) 
-            for filename in custom_dictionaries)
-    )
+    num_workers              = os.cpu_count() or 1 # 1 : serial
 
-    tokenizer = BasicStringTokenizer(token_regular_expression)
+    shard_rows               = 2000
 
-    case_optimizer = LetterCaseOptimizer(custom_dictionaries.union(
-        DefaultVocabularySet.stopwords, 
-        DefaultVocabularySet.wordnet, 
-        DefaultVocabularySet.words,
-        DefaultVocabularySet.names,
-    )) 
+    output_format            = "csv" # csv / parquet
 
-    lemmatizer = TokensTaggingLemmatizer()
+    enable_metrics           = False # per-stage timers, token counters and cache hit rates
 
-    stopword_filter = StopWordRemover(CustomWordSet(stopword_filename))
-
-    files_in_folder = sorted([  
-        os.path.join(training_data_folder, filename) for filename in 
-            os.listdir(training_data_folder) if (os.path.splitext(filename)[1].lower() == ".csv")
-    ])
+    # << PARAMETERS 
 
-    for idx, filename in enumerate(files_in_folder):
 
-        dataframe = pandas.read_csv(filename, encoding = "utf-8", error_bad_lines = False)
+    download_corpora()
 
-        num_rows = len(dataframe)
+    # build the snapshot and the compiled case optimizer once so that every worker maps / loads them instead of parsing the corpora
+    DefaultVocabularySet.initialize(vocabulary_snapshot)
 
-        rows_to_keep = []
+    TokenizationChain.load_case_optimizer(custom_dictionaries, vocabulary_snapshot)
 
-        for row_idx, row_data in dataframe.iterrows():
+    training_data_output_folder = strip_archive_suffix(training_data_folder) + "_tokenized"
 
-            sys.stdout.write("\rTokenizing #{0}: {1:.1f}%".format(idx, row_idx / num_rows * 100))
+    if not (os.path.exists(training_data_output_folder)):
+        os.makedirs(training_data_output_folder)
 
-            sys.stdout.flush()
+    files_in_folder = list_csv_sources(training_data_folder)
 
-            tokens = stopword_filter.remove(lemmatizer.lemmatize(
-                case_optimizer.optimize(remove_symbols(tokenizer.tokenize(str(row_data[dataframe_column_name])))
-            )))
+    # only new or changed inputs (or inputs tokenized under other parameters) are processed again
+    manifest = ProcessingManifest(os.path.join(training_data_output_folder, "manifest.json"))
 
-            rows_to_keep.append(len(tokens) >= min_tokens)
+    manifest_parameters = {
+        "stage"                    : "tokenizer",
+        "token_regular_expression" : token_regular_expression,
+        "dataframe_column_name"    : dataframe_column_name,
+        "min_tokens"               : min_tokens,
+        "output_format"            : output_format,
+        "custom_dictionaries"      : [  file_digest(filename) for filename in custom_dictionaries  ],
+        "stopwords"                : file_digest(stopword_filename),
+        "vocabulary_snapshot"      : files_stat_digest([ vocabulary_snapshot ])
+    }
 
-            dataframe.loc[row_idx, dataframe_column_name] = str(tokens)
+    pending_files = manifest.pending(files_in_folder, manifest_parameters)
 
-        sys.stdout.write(f"\rTokenizing #{idx}: 100.0%")
+    print(f"Skipping {len(files_in_folder) - len(pending_files)} Tokenized File(s).")
 
-        print("")
+    tokenize_dataframe_files(
+        pending_files, training_data_output_folder,
+        (custom_dictionaries, stopword_filename, token_regular_expression, vocabulary_snapshot),
+        dataframe_column_name, min_tokens, num_workers, shard_rows, output_format = output_format, enable_metrics = enable_metrics,
+        on_file_complete = lambda input_filename, output_filename : manifest.record(input_filename, manifest_parameters, output_filename)
+    )
 
-        output_filename = os.path.join(training_data_output_folder, os.path.basename(filename))
+    print("\nTokenization Complete.")
 
-        dataframe = dataframe[rows_to_keep]
+    if (enable_metrics):
 
-        dataframe.to_csv(output_filename, encoding = "utf-8", index = False)
+        metrics.export_json(os.path.join(training_data_output_folder, "metrics.json"))
 
-    print("\nTokenization Complete.")
\ No newline at end of file
+        metrics.export_prometheus(os.path.join(training_data_output_folder, "metrics.prom"))
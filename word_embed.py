@@ -1,52 +1,74 @@
+from corpus_io import parse_token_list, iterate_token_lists, list_token_sources, source_output_name
+from processing_manifest import ProcessingManifest
 from gensim.models import Word2Vec
-import pandas, pickle, ast, sys, os
+import itertools, pickle, numpy, array, json, sys, os
 from typing import *
 
 class DF2PKL:
 
-    @staticmethod 
-    def load_dataframe_tokens(training_data   : List[ List[ str ] ], 
-                              src_filename    : str, 
-                              column_name     : str, 
-                              encoding        : Optional[ str  ] = "utf-8", 
-                              error_bad_lines : Optional[ bool ] = False, 
-                              verbose         : Optional[ bool ] = True,
-                              verbose_label   : Optional[ str  ] = ""       ) -> None:
-        
-        dataframe = pandas.read_csv(src_filename, encoding = encoding, error_bad_lines = error_bad_lines)
-        num_rows = len(dataframe)
-        for row_idx, row_data in dataframe.iterrows():
+    parse_token_list = staticmethod(parse_token_list)
+
+    @classmethod 
+    def iterate_dataframe_tokens(class_, src_filename    : str, 
+                                         column_name     : str, 
+                                         encoding        : Optional[ str  ] = "utf-8", 
+                                         error_bad_lines : Optional[ bool ] = False, 
+                                         chunk_size      : Optional[ int  ] = 10000,
+                                         verbose         : Optional[ bool ] = True,
+                                         verbose_label   : Optional[ str  ] = ""       ) -> Iterator[ List[ str ] ]:
+
+        num_rows = 0
+        for chunk in iterate_token_lists(src_filename, column_name, encoding, error_bad_lines, chunk_size):
+            yield from chunk 
+            num_rows += len(chunk)
             if (verbose):
-                sys.stdout.write("\rProcessing{0}: {1:.1f}%".format(verbose_label, row_idx / num_rows * 100))
+                sys.stdout.write("\rProcessing{0}: {1:,} rows".format(verbose_label, num_rows))
                 sys.stdout.flush()
-            training_data.append(ast.literal_eval(str(row_data[column_name])))
         if (verbose):
-            sys.stdout.write("\rProcessing{0}: 100.0%".format(verbose_label))
             print("")
 
     @classmethod 
-    def load_dataframe_tokens_from_folders(class_, folder_list     : List[ str ], 
-                                                   column_name     : str, 
-                                                   encoding        : Optional[ str  ] = "utf-8", 
-                                                   error_bad_lines : Optional[ bool ] = False, 
-                                                   verbose         : Optional[ bool ] = True     ) -> List[ List[ str ] ]:
+    def load_dataframe_tokens(class_, training_data   : List[ List[ str ] ], 
+                                      src_filename    : str, 
+                                      column_name     : str, 
+                                      encoding        : Optional[ str  ] = "utf-8", 
+                                      error_bad_lines : Optional[ bool ] = False, 
+                                      verbose         : Optional[ bool ] = True,
+                                      verbose_label   : Optional[ str  ] = ""       ) -> None:
+        
+        training_data.extend(class_.iterate_dataframe_tokens(src_filename, column_name, encoding, error_bad_lines, verbose = verbose, verbose_label = verbose_label))
+
+    @staticmethod 
+    def dataframe_files_within_folder(folder_name : str, output_format : Optional[ str ] = None) -> List[ str ]:
+        return list_token_sources(folder_name, sort = False, output_format = output_format)
+
+    @classmethod 
+    def iterate_dataframe_tokens_from_folders(class_, folder_list     : List[ str ], 
+                                                      column_name     : str, 
+                                                      encoding        : Optional[ str  ] = "utf-8", 
+                                                      error_bad_lines : Optional[ bool ] = False, 
+                                                      chunk_size      : Optional[ int  ] = 10000,
+                                                      verbose         : Optional[ bool ] = True,
+                                                      output_format   : Optional[ str  ] = None     ) -> Iterator[ List[ str ] ]:
         
-        def dataframe_files_within_folder(folder_name : str, file_extension : Optional[ str ] = ".csv") -> List[ str ]:
-            return [
-                os.path.join(folder_name, filename) for filename in os.listdir(folder_name) 
-                    if (os.path.splitext(filename)[1].lower() == file_extension)
-            ]
-        list_of_list_of_strings = []
         for folder_idx, folder_name in enumerate(folder_list):
             if (verbose):
                 print("Processing Folder #{0}: \"{1}\"".format(folder_idx + 1, folder_name))
-            for dataframe_idx, dataframe_name in enumerate(dataframe_files_within_folder(folder_name, file_extension = ".csv")):
-                class_.load_dataframe_tokens(list_of_list_of_strings, dataframe_name, column_name, encoding, error_bad_lines, verbose, verbose_label = f" #{dataframe_idx + 1}")
+            for dataframe_idx, dataframe_name in enumerate(class_.dataframe_files_within_folder(folder_name, output_format)):
+                yield from class_.iterate_dataframe_tokens(dataframe_name, column_name, encoding, error_bad_lines, chunk_size, verbose, verbose_label = f" #{dataframe_idx + 1}")
             if (verbose):
                 print("")
         if (verbose):
             print("\nProcessing Complete.")
-        return list_of_list_of_strings
+
+    @classmethod 
+    def load_dataframe_tokens_from_folders(class_, folder_list     : List[ str ], 
+                                                   column_name     : str, 
+                                                   encoding        : Optional[ str  ] = "utf-8", 
+                                                   error_bad_lines : Optional[ bool ] = False, 
+                                                   verbose         : Optional[ bool ] = True     ) -> List[ List[ str ] ]:
+        
+        return list(class_.iterate_dataframe_tokens_from_folders(folder_list, column_name, encoding, error_bad_lines, verbose = verbose))
 
     @staticmethod 
     def dump(filename : str, training_data : List[ List[ str ] ], *args, **kwargs) -> None:
@@ -58,6 +80,169 @@ class DF2PKL:
         with open(filename, "rb") as rf:
             return pickle.load(rf, *args, **kwargs)
 
+class TokenCorpus:
+
+    # "<prefix>.vocab" (one token per line), "<prefix>.ids" (int32), "<prefix>.offsets" (int64, documents + 1)
+    VERSION = 1
+
+    def __init__(self, prefix : str) -> None:
+        with open(prefix + ".meta", "r", encoding = "utf-8") as rf:
+            self.meta = json.load(rf)
+        if (self.meta["version"] != self.VERSION):
+            raise ValueError(f"Incompatible token corpus: \"{prefix}\"")
+        with open(prefix + ".vocab", "r", encoding = "utf-8") as rf:
+            self.vocabulary = rf.read().split("\n")[ : self.meta["num_tokens"] ]
+        self.token_ids = numpy.memmap(prefix + ".ids", dtype = numpy.int32, mode = "r") if (self.meta["num_ids"]) else numpy.zeros(0, numpy.int32)
+        self.offsets = numpy.memmap(prefix + ".offsets", dtype = numpy.int64, mode = "r")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def document_ids(self, document_idx : int) -> numpy.ndarray:
+        return self.token_ids[ self.offsets[document_idx] : self.offsets[document_idx + 1] ]
+
+    def __iter__(self) -> Iterator[ List[ str ] ]:
+        vocabulary = self.vocabulary;  offsets = self.offsets.tolist()
+        for document_idx in range(len(offsets) - 1):
+            yield [  vocabulary[token_id] for token_id in self.token_ids[ offsets[document_idx] : offsets[document_idx + 1] ].tolist()  ]
+
+    @classmethod 
+    def build(class_, prefix : str, training_data : Iterable[ List[ str ] ]) -> "TokenCorpus":
+        vocabulary = dict();  offsets = array.array("q", [ 0 ])
+        with open(prefix + ".ids", "wb") as wf:
+            for tokens in training_data:
+                token_ids = [  vocabulary.setdefault(token, len(vocabulary)) for token in tokens  ]
+                numpy.asarray(token_ids, dtype = numpy.int32).tofile(wf)
+                offsets.append(offsets[-1] + len(token_ids))
+        with open(prefix + ".offsets", "wb") as wf:
+            offsets.tofile(wf)
+        with open(prefix + ".vocab", "w", encoding = "utf-8") as wf:
+            wf.write("\n".join(vocabulary))
+        with open(prefix + ".meta", "w", encoding = "utf-8") as wf:
+            json.dump({  "version" : class_.VERSION, "num_tokens" : len(vocabulary), "num_ids" : offsets[-1], "num_documents" : len(offsets) - 1  }, wf)
+        return class_(prefix)
+
+    @classmethod 
+    def convert_pickle(class_, prefix : str, pickle_filename : str) -> "TokenCorpus":
+        return class_.build(prefix, DF2PKL.load(pickle_filename))
+
+    @staticmethod 
+    def remove(prefix : str) -> None:
+        for extension in (".meta", ".vocab", ".ids", ".offsets"):
+            if (os.path.exists(prefix + extension)):
+                os.remove(prefix + extension)
+
+class TokenCorpusCollection:
+
+    # restartable iterable over several corpus segments, in the given order 
+    def __init__(self, prefixes : List[ str ]) -> None:
+        self.corpora = [  TokenCorpus(prefix) for prefix in prefixes  ]
+
+    @classmethod 
+    def from_manifest(class_, manifest : ProcessingManifest, source_filenames : List[ str ]) -> "TokenCorpusCollection":
+        # only the segments recorded for the current sources (stray or stale segments in the folder are ignored)
+        segment_filenames = [  manifest.output(filename) for filename in source_filenames  ]
+        missing_filenames = [  filename for filename, segment_filename in zip(source_filenames, segment_filenames) if (segment_filename is None)  ]
+        if (missing_filenames):
+            raise ValueError(f"{len(missing_filenames)} source(s) without a corpus segment, e.g. \"{missing_filenames[0]}\" (run CASE_PREPROCESS)")
+        return class_([  os.path.splitext(segment_filename)[0] for segment_filename in segment_filenames  ])
+
+    def __len__(self) -> int:
+        return sum(len(corpus) for corpus in self.corpora)
+
+    def __iter__(self) -> Iterator[ List[ str ] ]:
+        for corpus in self.corpora:
+            yield from corpus 
+
+class DataframeTokensCorpus:
+
+    # restartable iterable (Word2Vec makes one pass per epoch plus one for the vocabulary)
+    def __init__(self, folder_list : List[ str ], column_name : str, *args, **kwargs) -> None:
+        self.folder_list = folder_list 
+        self.column_name = column_name 
+        self.args, self.kwargs = args, kwargs 
+
+    def __iter__(self) -> Iterator[ List[ str ] ]:
+        return DF2PKL.iterate_dataframe_tokens_from_folders(self.folder_list, self.column_name, *self.args, **self.kwargs)
+
+class DocumentEmbedder:
+
+    POOLING_MEAN  = "mean"
+
+    POOLING_TFIDF = "tfidf"
+
+    # pools the word vectors of each document (unknown tokens are skipped, empty documents map to zeros)
+    def __init__(self, keyed_vectors : Any, idf : Optional[ numpy.ndarray ] = None) -> None:
+        self.vectors = keyed_vectors.vectors 
+        self.token_index = keyed_vectors.key_to_index 
+        self.vector_size = self.vectors.shape[1]
+        self.idf = idf
+
+    @classmethod 
+    def load(class_, model_filename : str, mmap : Optional[ str ] = "r", idf_filename : Optional[ str ] = None) -> "DocumentEmbedder":
+        idf = ((numpy.load(idf_filename)) if (idf_filename is not None) else (None))
+        return class_(Word2Vec.load(model_filename, mmap = mmap).wv, idf)
+
+    def token_ids(self, tokens : List[ str ]) -> List[ int ]:
+        token_index = self.token_index 
+        return [  token_index[token] for token in tokens if (token in token_index)  ]
+
+    def fit_idf(self, list_of_tokens : Iterable[ List[ str ] ]) -> "DocumentEmbedder":
+        # smoothed inverse document frequency per vocabulary id: log((1 + N) / (1 + df)) + 1
+        document_frequency = numpy.zeros(len(self.vectors), dtype = numpy.int64)
+        num_documents = 0
+        for tokens in list_of_tokens:
+            document_frequency[numpy.unique(numpy.array(self.token_ids(tokens), dtype = numpy.int64))] += 1
+            num_documents += 1
+        self.idf = (numpy.log((1 + num_documents) / (1 + document_frequency)) + 1).astype(numpy.float32)
+        return self
+
+    def save_idf(self, idf_filename : str) -> None:
+        with open(idf_filename, "wb") as wf:
+            numpy.save(wf, self.idf)
+
+    def embed(self, list_of_tokens : List[ List[ str ] ], pooling : Optional[ str ] = "mean") -> numpy.ndarray:
+        assert (pooling in (self.POOLING_MEAN, self.POOLING_TFIDF))
+        assert (pooling == self.POOLING_MEAN) or (self.idf is not None), "\"fit_idf\" or \"idf_filename\" is required for TF-IDF pooling"
+        list_of_ids = [  self.token_ids(tokens) for tokens in list_of_tokens  ]
+        lengths = numpy.fromiter(map(len, list_of_ids), dtype = numpy.int64, count = len(list_of_ids))
+        document_vectors = numpy.zeros((len(list_of_ids), self.vector_size), dtype = numpy.float32)
+        non_empty = (lengths > 0)
+        if (non_empty.any()):
+            # one gather over the concatenated ids, then one segmented sum per document
+            token_ids = numpy.fromiter(itertools.chain.from_iterable(list_of_ids), dtype = numpy.int64, count = int(lengths.sum()))
+            segment_starts = numpy.concatenate(([ 0 ], numpy.cumsum(lengths[non_empty])[ : -1 ]))
+            if (pooling == self.POOLING_MEAN):
+                document_vectors[non_empty] = numpy.add.reduceat(self.vectors[token_ids], segment_starts, axis = 0) / lengths[non_empty, None]
+            else:
+                # repeated tokens already contribute their term frequency
+                weights = self.idf[token_ids]
+                document_vectors[non_empty] = (
+                    numpy.add.reduceat(self.vectors[token_ids] * weights[:, None], segment_starts, axis = 0) / numpy.add.reduceat(weights, segment_starts)[:, None]
+                )
+        return document_vectors 
+
+    @staticmethod 
+    def similarity_matrix(vectors1 : numpy.ndarray, vectors2 : Optional[ numpy.ndarray ] = None) -> numpy.ndarray:
+        # cosine similarity of every row pair; zero vectors score 0 against everything
+        def normalize(vectors : numpy.ndarray) -> numpy.ndarray:
+            norms = numpy.linalg.norm(vectors, axis = 1, keepdims = True)
+            return vectors / numpy.where(norms > 0, norms, 1)
+        normalized1 = normalize(vectors1)
+        normalized2 = ((normalized1) if (vectors2 is None) else (normalize(vectors2)))
+        return normalized1 @ normalized2.T
+
+    def token_similarity_matrix(self, tokens1 : List[ str ], tokens2 : Optional[ List[ str ] ] = None) -> numpy.ndarray:
+        # raises "KeyError" for out-of-vocabulary tokens, like "KeyedVectors.similarity"
+        vectors1 = self.vectors[[  self.token_index[token] for token in tokens1  ]]
+        vectors2 = ((None) if (tokens2 is None) else (self.vectors[[  self.token_index[token] for token in tokens2  ]]))
+        return self.similarity_matrix(vectors1, vectors2)
+
+    def document_similarity_matrix(self, list_of_tokens1 : List[ List[ str ] ], list_of_tokens2 : Optional[ List[ List[ str ] ] ] = None, pooling : Optional[ str ] = "mean") -> numpy.ndarray:
+        vectors1 = self.embed(list_of_tokens1, pooling)
+        vectors2 = ((None) if (list_of_tokens2 is None) else (self.embed(list_of_tokens2, pooling)))
+        return self.similarity_matrix(vectors1, vectors2)
+
 if (__name__ == "__main__"):
 
 
@@ -69,6 +254,10 @@ if (__name__ == "__main__"):
 
     CASE_TESTING    = 2
 
+    CASE_STREAMING  = 3
+
+    CASE_CONVERT    = 4
+
     # << CONSTANTS
 
     
@@ -81,10 +270,20 @@ if (__name__ == "__main__"):
 
     training_data_pickle_filename = os.path.join(os.path.dirname(__file__), "dictionary/training_data.pickle")
 
+    # one corpus segment per tokenized CSV; segments of unchanged CSVs are reused (see "manifest.json")
+    training_segments_folder = os.path.join(os.path.dirname(__file__), "dictionary/training_data_segments")
+
+    # "training_data_pickle_filename" converted by CASE_CONVERT (kept apart from the per-CSV segments)
+    converted_corpus_prefix = os.path.join(os.path.dirname(__file__), "dictionary/training_data_converted/training_data_pickle")
+
+    train_on_converted_corpus = False 
+
     word2vec_model_name = os.path.join(os.path.dirname(__file__), "dictionary/w2v_embedder.model")
 
     dataframe_column_name = "content"
 
+    dataframe_file_format = None # csv / parquet (None : either, a file tokenized in both formats is rejected)
+
     vector_size = 200
 
     num_workers = 4
@@ -98,19 +297,50 @@ if (__name__ == "__main__"):
     # << PARAMETERS
 
 
+    source_filenames = {  folder_name : sorted(DF2PKL.dataframe_files_within_folder(folder_name, dataframe_file_format)) for folder_name in dataframe_folder_list if (os.path.exists(folder_name))  }
+
     if (CASE == CASE_PREPROCESS):
 
-        training_data = DF2PKL.load_dataframe_tokens_from_folders(dataframe_folder_list, dataframe_column_name)
+        os.makedirs(training_segments_folder, exist_ok = True)
+
+        manifest = ProcessingManifest(os.path.join(training_segments_folder, "manifest.json"))
+
+        manifest_parameters = {  "stage" : "word_embed", "dataframe_column_name" : dataframe_column_name, "corpus_version" : TokenCorpus.VERSION  }
+
+        # segments of deleted or renamed CSVs
+        for segment_filename in manifest.prune(sum(source_filenames.values(), [])):
+            TokenCorpus.remove(os.path.splitext(segment_filename)[0])
+
+        for folder_name, dataframe_filenames in source_filenames.items():
+
+            for dataframe_filename in manifest.pending(dataframe_filenames, manifest_parameters):
 
-        DF2PKL.dump(training_data_pickle_filename, training_data)
+                segment_prefix = os.path.join(training_segments_folder, "{0}__{1}".format(os.path.basename(folder_name), os.path.splitext(source_output_name(dataframe_filename))[0]))
 
-        print("\nSaved Training Data: \"{}\"".format(training_data_pickle_filename))
+                TokenCorpus.build(segment_prefix, DF2PKL.iterate_dataframe_tokens(dataframe_filename, dataframe_column_name, verbose_label = " \"{}\"".format(dataframe_filename)))
+
+                manifest.record(dataframe_filename, manifest_parameters, segment_prefix + ".meta")
+
+        print("\nSaved Training Data: \"{}\"".format(training_segments_folder))
+
+    if (CASE == CASE_CONVERT):
+
+        os.makedirs(os.path.dirname(converted_corpus_prefix), exist_ok = True)
+
+        TokenCorpus.convert_pickle(converted_corpus_prefix, training_data_pickle_filename)
+
+        print("Converted Training Data: \"{0}\" => \"{1}\"".format(training_data_pickle_filename, converted_corpus_prefix))
 
     if (CASE == CASE_TRAINING):
 
         print("> Loading Training Data...")
 
-        training_data = DF2PKL.load(training_data_pickle_filename)
+        if (train_on_converted_corpus):
+            training_data = TokenCorpusCollection([ converted_corpus_prefix ])
+        else:
+            training_data = TokenCorpusCollection.from_manifest(
+                ProcessingManifest(os.path.join(training_segments_folder, "manifest.json")), sum(source_filenames.values(), [])
+            )
 
         print("> Loading Success.\n")
 
@@ -126,20 +356,30 @@ if (__name__ == "__main__"):
 
         print("> Saving Success.")
 
-    if (CASE == CASE_TESTING):
+    if (CASE == CASE_STREAMING):
 
-        word_embedder = Word2Vec.load(word2vec_model_name)
+        print("> Training Embedder Model (Streaming)...")
 
-        def find_similarity(token1 : str, token2 : str, verbose : Optional[ bool ] = True) -> float:
-            global word_embedder
-            similarity_score = word_embedder.wv.similarity(token1, token2)
-            if (verbose):
-                print("Similarity {0:.3f} - \"{1}\" & \"{2}\"".format(abs(similarity_score), token1, token2))
-            return similarity_score
+        training_data = DataframeTokensCorpus(dataframe_folder_list, dataframe_column_name, verbose = False, output_format = dataframe_file_format)
+
+        word_embedder = Word2Vec(training_data, vector_size = vector_size, window = window_size, workers = num_workers, epochs = num_epochs)
+
+        print("> Training Success.\n")
+
+        print("> Saving Embedder Model...")
+
+        word_embedder.save(word2vec_model_name)
+
+        print("> Saving Success.")
+
+    if (CASE == CASE_TESTING):
+
+        document_embedder = DocumentEmbedder.load(word2vec_model_name)
 
         token1 = "girl"
 
         tokens = [ "boy", "woman", "laser", "universe", "program", "truck", "lady" ]
 
-        for token in tokens:
-            find_similarity(token1, token)
\ No newline at end of file
+        # one matrix product instead of one "wv.similarity" call per pair
+        for token, similarity_score in zip(tokens, document_embedder.token_similarity_matrix([ token1 ], tokens)[0]):
+            print("Similarity {0:.3f} - \"{1}\" & \"{2}\"".format(abs(similarity_score), token1, token))